@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Очередь фоновых задач только для просмотра: задачи
+    создаются кодом и выполняются воркерами run_workers.
+    """
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'run_at', 'created', 'finished')
+    list_filter = ('status', 'name')
+    search_fields = ('=idempotency_key',)
+    date_hierarchy = 'created'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite под конкурентную запись.
+
+    Каждое соединение получает прагмы из SQLITE_PRAGMAS (WAL,
+    busy_timeout и т.д.), а транзакции начинаются с BEGIN IMMEDIATE:
+    при обычном BEGIN транзакция, которая сначала читает, а потом
+    пишет, получает `database is locked` сразу, не дожидаясь
+    busy_timeout.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
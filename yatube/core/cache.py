@@ -0,0 +1,24 @@
+import hashlib
+
+from django.conf import settings
+
+MAX_PART_LENGTH = 64
+
+
+def make_key(namespace, *parts):
+    """Ключ кэша вида `posts.v1:feed_generation`.
+
+    Версия пространства берется из CACHE_NAMESPACE_VERSIONS: ее сдвиг
+    сбрасывает ключи одного приложения, не трогая остальные. Общий
+    префикс и версию всего сайта добавляет сам бэкенд (KEY_PREFIX,
+    VERSION). Длинные части хэшируются, чтобы ключ подходил
+    и для memcached/redis.
+    """
+    version = settings.CACHE_NAMESPACE_VERSIONS.get(namespace, 1)
+    key_parts = [f'{namespace}.v{version}']
+    for part in parts:
+        part = str(part)
+        if len(part) > MAX_PART_LENGTH or ' ' in part:
+            part = hashlib.md5(part.encode()).hexdigest()
+        key_parts.append(part)
+    return ':'.join(key_parts)
@@ -0,0 +1,93 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import make_key
+
+PIN_COOKIE = 'db_pinned'
+
+_state = threading.local()
+
+
+def replica_reads_enabled():
+    return getattr(_state, 'replica_reads', False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Внутри блока чтения моделей из REPLICA_APP_LABELS
+    уходят на реплики.
+    """
+    previous = replica_reads_enabled()
+    _state.replica_reads = enabled
+    try:
+        yield
+    finally:
+        _state.replica_reads = previous
+
+
+def primary_write_key():
+    return make_key('core', 'primary_write')
+
+
+def mark_primary_write():
+    """Отмечает запись, после которой реплики REPLICA_MAX_LAG
+    секунд могут отставать от основной базы.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(primary_write_key(), 1, settings.REPLICA_MAX_LAG)
+
+
+def replicas_may_lag():
+    return cache.get(primary_write_key()) is not None
+
+
+def read_replica(view):
+    """Читает данные view с реплики, если браузер не закреплен
+    за основной базой после собственной записи (см. PinPrimaryMiddleware).
+    Если после последней записи не прошло REPLICA_MAX_LAG секунд,
+    реплика могла ее еще не получить: такой ответ помечается
+    (replica_lagging), и кэши страниц его не сохраняют.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        enabled = (
+            bool(settings.DATABASE_REPLICAS)
+            and PIN_COOKIE not in request.COOKIES
+        )
+        request.replica_lag = enabled and replicas_may_lag()
+        with replica_reads(enabled):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def replica_lagging(request):
+    """Ответ на запрос отрисован по реплике, которая могла
+    отставать от последней записи.
+    """
+    return getattr(request, 'replica_lag', False)
+
+
+class ReplicaRouter:
+    """Чтение на случайную реплику из DATABASE_REPLICAS, запись
+    и все остальное — на default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and replica_reads_enabled()
+            and model._meta.app_label in settings.REPLICA_APP_LABELS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,261 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, close_old_connections, connection,
+                       connections, transaction)
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+CLAIM_BATCH = 10
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+_current = threading.local()
+
+
+def task(function=None, *, max_attempts=None):
+    """Регистрирует функцию как задачу очереди. function.delay(...)
+    ставит вызов в очередь, enqueue() — с ключом или задержкой.
+    Аргументы должны сериализоваться в JSON.
+    """
+    def register(function):
+        function.task_name = f'{function.__module__}.{function.__qualname__}'
+        function.max_attempts = max_attempts
+        function.delay = lambda *args, **kwargs: enqueue(
+            function, args, kwargs)
+        _tasks[function.task_name] = function
+        return function
+
+    return register(function) if function else register
+
+
+def get_task(name):
+    """Функция задачи по имени. Модуль импортируется, если воркер
+    его еще не загрузил, но выполняются только функции с @task.
+    """
+    if name not in _tasks:
+        import_string(name)
+    return _tasks[name]
+
+
+def enqueue(function, args=(), kwargs=None, idempotency_key=None, delay=0):
+    """Ставит задачу в очередь в текущей транзакции: воркеры увидят
+    ее только вместе с данными, ради которых она создана. Повторная
+    постановка с тем же ключом возвращает уже созданную задачу.
+    При JOBS_IMMEDIATE задача без задержки выполняется сразу.
+    """
+    if idempotency_key:
+        existing = Job.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+    job = Job(
+        name=function.task_name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        max_attempts=function.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        idempotency_key=idempotency_key,
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        return Job.objects.get(idempotency_key=idempotency_key)
+    if settings.JOBS_IMMEDIATE and not delay:
+        execute(lock_job(job.pk, 'immediate'))
+    return job
+
+
+def lock_job(pk, worker):
+    """Берет задачу условным UPDATE: из нескольких воркеров
+    его выполнит только один.
+    """
+    locked = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING,
+        locked_by=worker,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    return Job.objects.get(pk=pk) if locked else None
+
+
+def claim_job(worker):
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now())
+        .order_by('run_at', 'pk')
+        .values_list('pk', flat=True)[:CLAIM_BATCH]
+    )
+    for pk in candidates:
+        job = lock_job(pk, worker)
+        if job is not None:
+            return job
+    return None
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка со случайным разбросом, чтобы
+    упавшие разом задачи не возвращались тоже разом.
+    """
+    delay = min(
+        settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(0.5, 1)
+
+
+def call(job):
+    payload = json.loads(job.payload)
+    function = get_task(job.name)
+    if connection.in_atomic_block:
+        # Немедленный запуск внутри транзакции запроса: ошибка
+        # задачи откатывает только ее точку сохранения.
+        with transaction.atomic():
+            return function(*payload['args'], **payload['kwargs'])
+    return function(*payload['args'], **payload['kwargs'])
+
+
+def heartbeat():
+    """Продлевает блокировку выполняемой задачи. Задачи дольше
+    JOB_LOCK_TIMEOUT вызывают ее между порциями работы, иначе
+    requeue_stale сочтет их воркер упавшим. Вне задачи ничего
+    не делает.
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        Job.objects.filter(
+            pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by,
+        ).update(locked_at=timezone.now())
+
+
+def execute(job):
+    jobs = Job.objects.filter(pk=job.pk)
+    outer_job = getattr(_current, 'job', None)
+    _current.job = job
+    try:
+        call(job)
+    except Exception as error:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        if job.attempts < job.max_attempts:
+            jobs.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)),
+                locked_by='',
+                last_error=repr(error),
+            )
+        else:
+            jobs.update(
+                status=Job.FAILED,
+                finished=timezone.now(),
+                last_error=repr(error),
+            )
+    else:
+        jobs.update(status=Job.DONE, finished=timezone.now(), locked_by='')
+    finally:
+        _current.job = outer_job
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших воркеров: те, чья
+    блокировка не продлевалась (heartbeat) дольше JOB_LOCK_TIMEOUT.
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished=timezone.now())
+    stale.update(status=Job.QUEUED, locked_by='')
+
+
+def purge_finished():
+    Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_RETENTION),
+    ).delete()
+
+
+def work(worker, stop, poll_interval, once=False):
+    """Цикл потока воркера: выполняет задачи, пока они есть,
+    затем ждет poll_interval. С once завершается на пустой очереди.
+    """
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim_job(worker)
+            if job is not None:
+                execute(job)
+                continue
+            if once:
+                return
+            requeue_stale()
+            purge_finished()
+            stop.wait(poll_interval)
+    finally:
+        connection.close()
+
+
+def run_process(threads, poll_interval, once=False):
+    """Пул потоков одного процесса. SIGTERM и SIGINT дают потокам
+    доделать текущие задачи.
+    """
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+    name = f'{socket.gethostname()}:{os.getpid()}'
+    pool = [
+        threading.Thread(
+            target=work,
+            args=(f'{name}:{index}', stop, poll_interval, once),
+            name=f'jobs-{index}',
+        )
+        for index in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def run_workers(processes, threads, poll_interval, once=False):
+    """Запускает processes процессов по threads потоков. Соединения
+    с базой закрываются до fork, у каждого процесса они свои.
+    """
+    if processes == 1:
+        run_process(threads, poll_interval, once)
+        return
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    pool = [
+        context.Process(
+            target=run_process, args=(threads, poll_interval, once))
+        for _ in range(processes)
+    ]
+    for process in pool:
+        process.start()
+
+    def stop(*args):
+        for process in pool:
+            process.terminate()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+    for process in pool:
+        process.join()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.templating import compile_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны проекта и приложений и проверяет, '
+        'что шаблоны из extends и include существуют.'
+    )
+
+    def handle(self, *args, **options):
+        names, errors = compile_templates()
+        for name, error in errors:
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(
+                f'Ошибок в шаблонах: {len(errors)} из {len(names)}')
+        self.stdout.write(f'Скомпилировано шаблонов: {len(names)}')
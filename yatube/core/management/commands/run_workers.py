@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import run_workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркеры очереди фоновых задач core.jobs: '
+        'processes процессов по threads потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOB_WORKER_PROCESSES)
+        parser.add_argument(
+            '--threads', type=int, default=settings.JOB_WORKER_THREADS)
+        parser.add_argument(
+            '--poll', type=float, default=settings.JOB_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Воркеры: {options["processes"]} x {options["threads"]}')
+        run_workers(
+            options['processes'],
+            options['threads'],
+            options['poll'],
+            options['once'],
+        )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.stress import run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная запись в SQLite в профилях default и tuned: '
+        'показывает число ошибок `database is locked` и время.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=50,
+                            help='Записей на поток.')
+
+    def handle(self, *args, **options):
+        for profile, engine in settings.SQLITE_ENGINES.items():
+            result = run_stress(
+                engine, options['threads'], options['writes'])
+            self.stdout.write(
+                f'{profile}: ошибок {result["errors"]}, '
+                f'сохранено {result["saved"]}, {result["seconds"]} с'
+            )
@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.conf import settings
+
+from . import profiling
+from .db import PIN_COOKIE
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PinPrimaryMiddleware:
+    """После POST браузер на REPLICA_PIN_SECONDS читает только
+    с основной базы: реплика может отставать, а автор должен
+    сразу увидеть свой пост или комментарий.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос, если профилирование включено
+    настройкой PROFILING_ENABLED, запрос попал в долю
+    PROFILING_SAMPLE_RATE или сотрудник прислал заголовок
+    X-Profile. Стоит последним, поэтому время — это время view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.last_dump = time.monotonic()
+
+    def should_profile(self, request):
+        if settings.PROFILING_ENABLED:
+            return True
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+        return 'HTTP_X_PROFILE' in request.META and request.user.is_staff
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        with profiling.RequestProfile().activate() as profile:
+            response = self.get_response(request)
+        match = request.resolver_match
+        profiling.record(match.view_name if match else '-', profile)
+        response['Server-Timing'] = ', '.join((
+            f'view;dur={profile.view_ms:.1f}',
+            f'sql;dur={profile.sql_ms:.1f}',
+            f'template;dur={profile.template_ms:.1f}',
+        ))
+        self.dump()
+        return response
+
+    def dump(self):
+        path = settings.PROFILING_DUMP_PATH
+        now = time.monotonic()
+        if path and now - self.last_dump >= settings.PROFILING_DUMP_INTERVAL:
+            self.last_dump = now
+            profiling.dump(path)
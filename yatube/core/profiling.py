@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+TOP_QUERIES = 10
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+_missing = object()
+
+
+def fingerprint(sql):
+    """Запрос без значений: литералы и параметры заменяются на ?,
+    списки IN (?, ?, ...) сворачиваются.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def active_profiles():
+    return getattr(_local, 'profiles', ())
+
+
+def current_profile():
+    profiles = active_profiles()
+    return profiles[-1] if profiles else None
+
+
+class RequestProfile:
+    def __init__(self):
+        self.view_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def sql_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (fingerprint(sql), (time.perf_counter() - started) * 1000))
+
+    def cache_get(self, original):
+        def get(key, default=None, version=None):
+            value = original(key, _missing, version=version)
+            if value is _missing:
+                self.cache_misses += 1
+                return default
+            self.cache_hits += 1
+            return value
+        return get
+
+    @contextmanager
+    def activate(self):
+        """Включает запись SQL, шаблонов и кэша для текущего потока.
+        Кэш и соединения у каждого потока свои, поэтому подмена
+        методов не задевает другие запросы.
+        """
+        backend = caches['default']
+        # Профили могут вкладываться (benchmark_posts внутри
+        # ProfilingMiddleware), поэтому внешняя обертка get
+        # и внешний профиль восстанавливаются, а не удаляются.
+        previous_get = backend.__dict__.get('get', _missing)
+        previous_profiles = active_profiles()
+        backend.get = self.cache_get(backend.get)
+        _local.profiles = (*previous_profiles, self)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.execute))
+                yield self
+        finally:
+            self.view_ms = (time.perf_counter() - started) * 1000
+            _local.profiles = previous_profiles
+            if previous_get is _missing:
+                del backend.get
+            else:
+                backend.get = previous_get
+
+
+def install_template_timer():
+    """Оборачивает Template.render: время считается только для
+    внешнего шаблона, вложенные include входят в него.
+    """
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    @wraps(render)
+    def timed_render(self, context):
+        profiles = active_profiles()
+        if not profiles:
+            return render(self, context)
+        for profile in profiles:
+            profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            for profile in profiles:
+                profile.template_depth -= 1
+                if not profile.template_depth:
+                    profile.template_ms += elapsed
+
+    timed_render.profiled = True
+    Template.render = timed_render
+
+
+def record(name, profile):
+    with _lock:
+        stats = _stats.setdefault(name, {
+            'requests': 0,
+            'view_ms': 0.0,
+            'max_view_ms': 0.0,
+            'queries': 0,
+            'sql_ms': 0.0,
+            'template_ms': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'fingerprints': {},
+        })
+        stats['requests'] += 1
+        stats['view_ms'] += profile.view_ms
+        stats['max_view_ms'] = max(stats['max_view_ms'], profile.view_ms)
+        stats['queries'] += len(profile.queries)
+        stats['sql_ms'] += profile.sql_ms
+        stats['template_ms'] += profile.template_ms
+        stats['cache_hits'] += profile.cache_hits
+        stats['cache_misses'] += profile.cache_misses
+        for sql, duration in profile.queries:
+            query = stats['fingerprints'].setdefault(
+                sql, {'count': 0, 'ms': 0.0})
+            query['count'] += 1
+            query['ms'] += duration
+
+
+def snapshot():
+    """Средние значения по каждому маршруту, самые медленные
+    маршруты первыми.
+    """
+    with _lock:
+        views = []
+        for name, stats in _stats.items():
+            requests = stats['requests']
+            fingerprints = sorted(
+                stats['fingerprints'].items(),
+                key=lambda item: item[1]['ms'],
+                reverse=True,
+            )[:TOP_QUERIES]
+            views.append({
+                'name': name,
+                'requests': requests,
+                'view_ms': round(stats['view_ms'] / requests, 3),
+                'max_view_ms': round(stats['max_view_ms'], 3),
+                'queries': round(stats['queries'] / requests, 2),
+                'sql_ms': round(stats['sql_ms'] / requests, 3),
+                'template_ms': round(stats['template_ms'] / requests, 3),
+                'cache_hits': stats['cache_hits'],
+                'cache_misses': stats['cache_misses'],
+                'top_queries': [
+                    {'sql': sql, 'count': query['count'],
+                     'ms': round(query['ms'], 3)}
+                    for sql, query in fingerprints
+                ],
+            })
+    views.sort(key=lambda view: view['view_ms'] * view['requests'],
+               reverse=True)
+    return {'pid': os.getpid(), 'views': views}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def dump(path):
+    """Пишет снимок атомарно: сначала во временный файл."""
+    path = path.format(pid=os.getpid())
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stream:
+        json.dump(snapshot(), stream, ensure_ascii=False, indent=2)
+    os.replace(temporary, path)
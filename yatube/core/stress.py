@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import OperationalError, connections, transaction
+
+STRESS_ALIAS = 'stress'
+
+
+@contextmanager
+def stress_database(engine):
+    """Временная база во временном файле под алиасом STRESS_ALIAS:
+    прагмы WAL и блокировки работают только с файлом, а не с
+    базой тестов в памяти.
+    """
+    directory = tempfile.mkdtemp()
+    connections.databases[STRESS_ALIAS] = {
+        'ENGINE': engine,
+        'NAME': os.path.join(directory, 'stress.sqlite3'),
+    }
+    connections.ensure_defaults(STRESS_ALIAS)
+    try:
+        with connections[STRESS_ALIAS].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE comment (id INTEGER PRIMARY KEY, text TEXT)')
+            cursor.execute(
+                'CREATE TABLE counter (id INTEGER PRIMARY KEY, value INT)')
+            cursor.execute('INSERT INTO counter VALUES (1, 0)')
+        yield
+    finally:
+        connections[STRESS_ALIAS].close()
+        del connections[STRESS_ALIAS]
+        del connections.databases[STRESS_ALIAS]
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def write_comments(writes, errors):
+    """Запись как в add_comment: прочитать счетчик, добавить
+    комментарий и увеличить счетчик в одной транзакции.
+    """
+    connection = connections[STRESS_ALIAS]
+    try:
+        for index in range(writes):
+            try:
+                with transaction.atomic(using=STRESS_ALIAS):
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            'SELECT value FROM counter WHERE id = 1')
+                        cursor.execute(
+                            'INSERT INTO comment (text) VALUES (%s)',
+                            [f'Комментарий {index}'])
+                        cursor.execute(
+                            'UPDATE counter SET value = value + 1 '
+                            'WHERE id = 1')
+            except OperationalError:
+                errors.append(index)
+    finally:
+        connection.close()
+
+
+def run_stress(engine, threads=8, writes=50):
+    """Запускает threads потоков по writes записей и возвращает
+    число ошибок `database is locked`, сохраненных записей и время.
+    """
+    errors = []
+    with stress_database(engine):
+        workers = [
+            threading.Thread(target=write_comments, args=(writes, errors))
+            for _ in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        with connections[STRESS_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT value FROM counter WHERE id = 1')
+            saved = cursor.fetchone()[0]
+    return {
+        'errors': len(errors),
+        'saved': saved,
+        'seconds': round(elapsed, 3),
+    }
@@ -0,0 +1,91 @@
+import logging
+import os
+
+from django.conf import settings
+from django.template import (TemplateDoesNotExist, TemplateSyntaxError,
+                             engines)
+from django.template.loader_tags import ExtendsNode, IncludeNode
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+# Шаблоны виджетов рендерит FORM_RENDERER своим движком,
+# в котором есть django/forms/widgets.
+FORM_WIDGETS_DIR = 'widgets/'
+
+logger = logging.getLogger(__name__)
+
+
+def template_dirs(loaders):
+    """Каталоги загрузчиков, включая вложенные в cached.Loader."""
+    for loader in loaders:
+        if hasattr(loader, 'loaders'):
+            yield from template_dirs(loader.loaders)
+        elif hasattr(loader, 'get_dirs'):
+            yield from loader.get_dirs()
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    for directory in template_dirs(engine.template_loaders):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(TEMPLATE_EXTENSIONS):
+                    path = os.path.relpath(
+                        os.path.join(root, filename), directory)
+                    names.add(path.replace(os.sep, '/'))
+    return sorted(
+        name for name in names if f'/{FORM_WIDGETS_DIR}' not in name)
+
+
+def referenced_names(template):
+    """Шаблоны из {% extends %} и {% include %}, заданные строкой."""
+    expressions = [
+        node.parent_name
+        for node in template.nodelist.get_nodes_by_type(ExtendsNode)
+    ] + [
+        node.template
+        for node in template.nodelist.get_nodes_by_type(IncludeNode)
+    ]
+    return [
+        expression.var for expression in expressions
+        if isinstance(expression.var, str) and not expression.filters
+    ]
+
+
+def compile_templates(engine=None, names=None):
+    """Разбирает шаблоны и проверяет, что все шаблоны из extends
+    и include существуют. С кэширующим загрузчиком разобранные
+    шаблоны остаются в его кэше. Возвращает имена и список ошибок.
+    """
+    engine = engine or engines['django'].engine
+    if names is None:
+        names = template_names(engine)
+    errors = []
+    for name in names:
+        try:
+            template = engine.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            errors.append((name, str(error)))
+            continue
+        for referenced in referenced_names(template):
+            try:
+                engine.get_template(referenced)
+            except TemplateDoesNotExist:
+                errors.append((name, f'не найден шаблон {referenced}'))
+            except TemplateSyntaxError:
+                # Ошибка попадет в отчет при разборе самого шаблона.
+                pass
+    return names, errors
+
+
+def warm_up():
+    """Прогревает кэширующий загрузчик при старте процесса,
+    чтобы первые запросы не разбирали шаблоны.
+    """
+    if settings.TEMPLATE_PROFILE != 'cached':
+        return
+    names, errors = compile_templates()
+    for name, error in errors:
+        logger.error('Шаблон %s: %s', name, error)
+    logger.info('Скомпилировано шаблонов: %s', len(names))
@@ -0,0 +1,373 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.template import Context, Engine, Template
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+
+from . import profiling
+from .cache import make_key
+from .db import (PIN_COOKIE, mark_primary_write, primary_write_key,
+                 read_replica, replica_lagging, replica_reads)
+from .jobs import enqueue, heartbeat, requeue_stale, task, work
+from .models import Job
+from .stress import STRESS_ALIAS, run_stress, stress_database
+from .templating import compile_templates
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise ValueError('Сбой задачи')
+
+
+@task(max_attempts=1)
+def long_running():
+    """Задача, которая выполняется дольше JOB_LOCK_TIMEOUT
+    и продлевает блокировку между порциями.
+    """
+    running = Job.objects.filter(status=Job.RUNNING)
+    running.update(locked_at=timezone.now() - timedelta(hours=1))
+    heartbeat()
+    requeue_stale()
+    calls.extend(running.values_list('status', flat=True))
+
+
+class CacheKeyTests(TestCase):
+
+    def test_make_key_uses_namespace_version(self):
+        """Версия пространства входит в ключ и сбрасывает его."""
+        key = make_key('posts', 'feed_generation')
+        self.assertEqual(key, 'posts.v1:feed_generation')
+        with override_settings(CACHE_NAMESPACE_VERSIONS={'posts': 2}):
+            self.assertNotEqual(make_key('posts', 'feed_generation'), key)
+
+    def test_make_key_hashes_long_parts(self):
+        """Длинные и содержащие пробелы части хэшируются."""
+        key = make_key('posts', 'SELECT * FROM posts_post WHERE ...')
+        self.assertNotIn(' ', key)
+        self.assertLessEqual(len(key), 64)
+
+
+class SharedCacheTests(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def make_worker_cache(self):
+        config = settings.CACHE_BACKENDS['file']
+        backend = import_string(config['BACKEND'])
+        return backend(self.location, {
+            'OPTIONS': config['OPTIONS'],
+            'KEY_PREFIX': 'yatube',
+        })
+
+    def test_file_cache_is_shared_between_workers(self):
+        """Файловый кэш виден всем процессам: сброс в одном
+        воркере виден в другом.
+        """
+        first_worker = self.make_worker_cache()
+        second_worker = self.make_worker_cache()
+        key = make_key('posts', 'feed_generation')
+        first_worker.set(key, 1, None)
+        second_worker.set(key, 2, None)
+        self.assertEqual(first_worker.get(key), 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRouterTests(TestCase):
+
+    def read_db(self, request):
+        @read_replica
+        def view(request):
+            return router.db_for_read(Post)
+        return view(request)
+
+    def test_reads_inside_replica_views_go_to_replica(self):
+        """Чтения из помеченных view идут на реплику, остальное
+        и любые записи — на default.
+        """
+        request = RequestFactory().get('/')
+        cache.clear()
+        self.assertEqual(self.read_db(request), 'replica_0')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertEqual(
+                router.db_for_read(get_user_model()), 'default')
+
+    def test_recent_write_marks_replica_lag(self):
+        """После записи чтения остаются на реплике, но ответ
+        помечается как отрисованный по возможно отстающим данным.
+        """
+        request = RequestFactory().get('/')
+        cache.clear()
+        mark_primary_write()
+        self.assertEqual(self.read_db(request), 'replica_0')
+        self.assertTrue(replica_lagging(request))
+        cache.delete(primary_write_key())
+        self.assertEqual(self.read_db(request), 'replica_0')
+        self.assertFalse(replica_lagging(request))
+
+    def test_post_pins_browser_to_primary(self):
+        """После своего POST пользователь читает с default."""
+        user = get_user_model().objects.create_user(username='auth')
+        post = Post.objects.create(text='Тестовый пост', author=user)
+        client = Client()
+        client.force_login(user)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            response.cookies[PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS,
+        )
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_db(request), 'default')
+
+
+class SQLiteTuningTests(TestCase):
+
+    def test_tuned_connection_uses_wal(self):
+        """Профиль tuned включает WAL и busy_timeout на соединении."""
+        with stress_database(settings.SQLITE_ENGINES['tuned']):
+            with connections[STRESS_ALIAS].cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(
+                    cursor.fetchone()[0],
+                    settings.SQLITE_PRAGMAS['busy_timeout'],
+                )
+
+    def test_concurrent_writes_do_not_lock(self):
+        """Конкурентные транзакции чтение-запись в профиле tuned
+        дожидаются блокировки вместо `database is locked`.
+        """
+        result = run_stress(
+            settings.SQLITE_ENGINES['tuned'], threads=6, writes=20)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['saved'], 120)
+
+
+class TemplateCompilationTests(TestCase):
+
+    def test_project_templates_compile(self):
+        """Все шаблоны проекта разбираются, extends и include
+        ссылаются на существующие шаблоны.
+        """
+        names, errors = compile_templates()
+        self.assertIn('posts/post_detail.html', names)
+        self.assertEqual(errors, [])
+
+    def test_errors_are_reported(self):
+        engine = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+            'include.html': "{% include 'missing.html' %}",
+            'extends.html': "{% extends 'missing.html' %}",
+            'syntax.html': '{% if %}',
+            'ok.html': "{% include 'include.html' %}",
+        })])
+        _, errors = compile_templates(
+            engine, ['include.html', 'extends.html', 'syntax.html', 'ok.html'])
+        self.assertEqual(
+            [name for name, _ in errors],
+            ['include.html', 'extends.html', 'syntax.html'],
+        )
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user_model = get_user_model()
+        cls.admin = user_model.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.user = user_model.objects.create_user(username='auth')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def test_fingerprint_drops_values(self):
+        """Отпечаток запроса не зависит от значений."""
+        self.assertEqual(
+            profiling.fingerprint(
+                "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x' "
+                'LIMIT 21'),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_profiles_can_be_nested(self):
+        """Вложенный профиль не ломает внешний: обертка кэша
+        и текущий профиль восстанавливаются.
+        """
+        backend = caches['default']
+        outer, inner = profiling.RequestProfile(), profiling.RequestProfile()
+        with outer.activate():
+            with inner.activate():
+                backend.get('missing')
+                Template('{{ value }}').render(Context({'value': 1}))
+            self.assertIs(profiling.current_profile(), outer)
+            backend.get('missing')
+        self.assertNotIn('get', backend.__dict__)
+        self.assertIsNone(profiling.current_profile())
+        self.assertEqual((inner.cache_misses, outer.cache_misses), (1, 2))
+        self.assertGreater(inner.template_ms, 0)
+        self.assertGreaterEqual(outer.template_ms, inner.template_ms)
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_request_breakdown_is_aggregated_per_view(self):
+        """SQL, шаблоны и кэш учитываются по имени маршрута."""
+        response = self.admin_client.get(reverse('posts:index'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.admin_client.get(reverse('posts:index'))
+        stats = {view['name']: view for view in profiling.snapshot()['views']}
+        index = stats['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['queries'], 0)
+        self.assertGreater(index['template_ms'], 0)
+        self.assertGreater(index['cache_hits'] + index['cache_misses'], 0)
+        self.assertTrue(index['top_queries'])
+
+    def test_header_enables_profiling_only_for_staff(self):
+        """Заголовок X-Profile учитывается только у сотрудников."""
+        url = reverse('posts:index')
+        user_client = Client()
+        user_client.force_login(self.user)
+        user_client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(profiling.snapshot()['views'], [])
+        self.admin_client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(len(profiling.snapshot()['views']), 1)
+
+    def test_stats_page_is_admin_only(self):
+        """Страница статистики доступна только в админке."""
+        url = reverse('profiling_stats')
+        self.assertEqual(Client().get(url).status_code, 302)
+        self.assertEqual(self.admin_client.get(url).status_code, 200)
+        response = self.admin_client.get(url, {'format': 'json'})
+        self.assertIn('views', response.json())
+
+    def test_stats_are_dumped_to_json(self):
+        """Снимок статистики периодически пишется в файл."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'profiling-{pid}.json')
+        with override_settings(PROFILING_ENABLED=True,
+                               PROFILING_DUMP_PATH=path,
+                               PROFILING_DUMP_INTERVAL=0):
+            Client().get(reverse('posts:index'))
+        with open(path.format(pid=os.getpid()), encoding='utf-8') as stream:
+            views = json.load(stream)['views']
+        self.assertEqual(views[0]['name'], 'posts:index')
+
+
+@override_settings(JOBS_IMMEDIATE=False)
+class JobQueueTests(TransactionTestCase):
+    """Воркер закрывает соединение с базой, поэтому очередь
+    проверяется вне транзакции теста.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        work('test', threading.Event(), 0, once=True)
+
+    def test_worker_runs_queued_job(self):
+        """Задача ждет воркера и выполняется им один раз."""
+        job = record.delay('пост')
+        self.assertEqual(calls, [])
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(calls, ['пост'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Упавшая задача возвращается в очередь с задержкой,
+        а после max_attempts помечается как ошибочная.
+        """
+        job = fail.delay()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Сбой задачи', job.last_error)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_idempotency_key(self):
+        """Повторная постановка с тем же ключом не создает задачу."""
+        first = enqueue(record, ('пост',), idempotency_key='post-1')
+        second = enqueue(record, ('пост',), idempotency_key='post-1')
+        self.assertEqual(first.pk, second.pk)
+        self.run_worker()
+        self.assertEqual(calls, ['пост'])
+
+    def test_stale_job_is_requeued(self):
+        """Задача упавшего воркера возвращается в очередь."""
+        job = record.delay('пост')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        requeue_stale()
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.QUEUED)
+
+    def test_heartbeat_keeps_long_job_running(self):
+        """Задача, продлевающая блокировку, не возвращается
+        в очередь и не помечается ошибочной, пока выполняется.
+        """
+        job = long_running.delay()
+        self.run_worker()
+        self.assertEqual(calls, [Job.RUNNING])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(JOBS_IMMEDIATE=True)
+    def test_immediate_mode(self):
+        """При JOBS_IMMEDIATE задача выполняется при постановке,
+        а отложенная ждет воркера.
+        """
+        job = record.delay('сразу')
+        self.assertEqual(calls, ['сразу'])
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.DONE)
+        delayed = enqueue(record, ('потом',), delay=60)
+        self.assertEqual(calls, ['сразу'])
+        self.assertEqual(delayed.status, Job.QUEUED)
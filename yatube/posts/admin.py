@@ -1,16 +1,202 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import (ERROR_FLAG, IGNORED_PARAMS,
+                                             PAGE_VAR, SEARCH_VAR)
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, ModerationJob, Post
+from .moderation import start_job
+from .paginators import EstimatedCountPaginator
+from .search import search_posts
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, который берет выбранный объект из selected,
+    а не загружает его отдельным запросом.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(pk) for pk in value] != [str(selected.pk)]:
+            return super().optgroups(name, value, attr)
+        options = [] if self.is_required else [
+            self.create_option(name, '', '', False, 0)]
+        options.append(self.create_option(
+            name,
+            selected.pk,
+            self.choices.field.label_from_instance(selected),
+            True,
+            len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class PreloadedChangeListForm(forms.ModelForm):
+    """Форма строки list_editable: автокомплиты получают связанные
+    объекты, уже загруженные через list_select_related.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, PreloadedAutocompleteSelect):
+                widget.selected = getattr(self.instance, name)
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    """Списки больших таблиц: без точного COUNT(*), без подсчета
+    всех записей рядом с результатами фильтра и без запросов
+    на каждую строку.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PreloadedChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+
+class MoveToGroupForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.order_by('title'), label='Группа')
+
+
+class PurgeCommentsForm(forms.Form):
+    text = forms.CharField(label='Текст комментария', min_length=3)
+
+
+class ModerationAdmin(PerformanceAdmin):
+    """Массовые действия выполняются фоновой задачей
+    (posts.moderation) порциями UPDATE/DELETE. Стандартное
+    удаление заменено на нее: оно загружает все объекты
+    и каскад ради страницы подтверждения.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def selection(self, request, queryset):
+        """Выборка действия для задачи в JSON: id отмеченных строк,
+        а при «выбрать все» — фильтры и поиск списка. Задача строит
+        по ним выборку сама (moderation.selection_queryset).
+        """
+        if request.POST.get('select_across') != '1':
+            return {'ids': list(queryset.values_list('pk', flat=True))}
+        ignored = {*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG}
+        return {
+            'filters': {
+                key: value for key, value in request.GET.items()
+                if key not in ignored
+            },
+            'search': request.GET.get(SEARCH_VAR, ''),
+        }
+
+    def confirm_job(self, request, title, make_job, form_class=None,
+                    initial=None):
+        """Страница подтверждения массового действия. После
+        подтверждения make_job(данные формы) возвращает действие
+        и параметры задачи, и задача запускается.
+        """
+        confirmed = 'apply' in request.POST
+        form = form_class and form_class(
+            request.POST if confirmed else None, initial=initial)
+        if confirmed and (form is None or form.is_valid()):
+            action, params = make_job(form.cleaned_data if form else {})
+            job = start_job(action, params, request.user)
+            url = reverse(
+                'admin:posts_moderationjob_change', args=(job.pk,))
+            self.message_user(
+                request,
+                format_html('Задача <a href="{}">{}</a> запущена.', url, job),
+                messages.SUCCESS,
+            )
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'title': title,
+            'opts': self.model._meta,
+            'form': form,
+            'action': request.POST['action'],
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(
+            request, 'admin/posts/moderation_confirm.html', context)
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ModerationAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term:
+            return queryset, False
+        matched = search_posts(search_term).values('pk')
+        return queryset.filter(pk__in=matched), False
+
+    def delete_posts(self, request, queryset):
+        return self.confirm_job(
+            request, 'Удалить выбранные посты?',
+            lambda data: (ModerationJob.DELETE_POSTS, {
+                'selection': self.selection(request, queryset)}),
+        )
+
+    delete_posts.short_description = 'Удалить выбранные посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def delete_author_posts(self, request, queryset):
+        authors = queryset.order_by().values_list(
+            'author_id', flat=True).distinct()
+        return self.confirm_job(
+            request, 'Удалить все посты авторов выбранных постов?',
+            lambda data: (
+                ModerationJob.DELETE_AUTHOR_POSTS, {'authors': list(authors)}),
+        )
+
+    delete_author_posts.short_description = (
+        'Удалить все посты авторов выбранных постов')
+    delete_author_posts.allowed_permissions = ('delete',)
+
+    def move_to_group(self, request, queryset):
+        return self.confirm_job(
+            request, 'Перенести выбранные посты в группу',
+            lambda data: (ModerationJob.MOVE_POSTS, {
+                'selection': self.selection(request, queryset),
+                'group': data['group'].pk,
+            }),
+            MoveToGroupForm,
+        )
+
+    move_to_group.short_description = 'Перенести выбранные посты в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    actions = ('delete_posts', 'delete_author_posts', 'move_to_group')
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -21,13 +207,70 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ModerationAdmin):
     list_display = ('pk', 'author', 'text', 'post', 'created')
-    search_fields = ('author',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('=author__username',)
     list_filter = ('created',)
+    actions = ('delete_comments', 'purge_comments')
+
+    def delete_comments(self, request, queryset):
+        return self.confirm_job(
+            request, 'Удалить выбранные комментарии?',
+            lambda data: (ModerationJob.DELETE_COMMENTS, {
+                'selection': self.selection(request, queryset)}),
+        )
+
+    delete_comments.short_description = 'Удалить выбранные комментарии'
+    delete_comments.allowed_permissions = ('delete',)
+
+    def purge_comments(self, request, queryset):
+        """Удаляет все комментарии с текстом, по умолчанию —
+        с текстом первого выбранного комментария.
+        """
+        return self.confirm_job(
+            request, 'Удалить все комментарии с текстом',
+            lambda data: (
+                ModerationJob.PURGE_COMMENTS, {'text': data['text']}),
+            PurgeCommentsForm,
+            initial={
+                'text': queryset.values_list('text', flat=True).first()},
+        )
+
+    purge_comments.short_description = 'Удалить все комментарии с этим текстом'
+    purge_comments.allowed_permissions = ('delete',)
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(PerformanceAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+
+
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'action', 'status', 'progress', 'created_by', 'created',
+        'finished',
+    )
+    list_select_related = ('created_by',)
+    list_filter = ('status', 'action')
+    readonly_fields = (
+        'action', 'status', 'progress', 'error', 'created_by', 'created',
+        'finished',
+    )
+    exclude = ('params', 'total', 'done')
+
+    def progress(self, job):
+        return f'{job.done} из {job.total}'
+
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
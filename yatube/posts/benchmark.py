@@ -0,0 +1,177 @@
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.profiling import RequestProfile
+
+from .models import Comment, Follow, Group, Post, User
+from .urls import app_name, urlpatterns
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def seed(users=20, groups=5, posts=500, comments=1000, follows=100):
+    """Заполняет базу через mixer, как фикстуры tests/: объекты
+    сохраняются по одному, поэтому срабатывают все сигналы.
+    """
+    from mixer.backend.django import mixer
+
+    authors = mixer.cycle(users).blend(
+        User, username=mixer.sequence('bench_user_{0}'))
+    mixer.cycle(groups).blend(Group, slug=mixer.sequence('bench-group-{0}'))
+    mixer.cycle(posts).blend(
+        Post, author=mixer.SELECT, group=mixer.SELECT, image='')
+    mixer.cycle(comments).blend(
+        Comment, post=mixer.SELECT, author=mixer.SELECT)
+    pairs = {
+        (follower.pk, author.pk)
+        for follower, author in (
+            random.sample(authors, 2) for _ in range(follows))
+    }
+    for follower_id, author_id in pairs:
+        mixer.blend(Follow, user_id=follower_id, author_id=author_id)
+    reader = authors[0]
+    reader.set_password(BENCHMARK_PASSWORD)
+    reader.save()
+    return reader
+
+
+def route_requests(reader):
+    """Запрос (метод, URL, тело JSON) для каждого маршрута
+    posts/urls.py на засеянных данных. Маршруты только для POST
+    получают корректное тело, иначе замерялся бы ответ 405.
+    """
+    post = Post.objects.filter(author=reader).first() or Post.objects.first()
+    author = User.objects.exclude(pk=reader.pk).first()
+    values = {
+        'slug': Group.objects.values_list('slug', flat=True).first(),
+        'username': author.username,
+        'post_id': post.pk,
+        'feed_format': 'json',
+    }
+    bodies = {
+        'follow_batch': {
+            'action': 'follow', 'usernames': [author.username]},
+    }
+    routes = {}
+    for pattern in urlpatterns:
+        kwargs = {
+            name: values[name] for name in pattern.pattern.converters}
+        url = reverse(f'{app_name}:{pattern.name}', kwargs=kwargs)
+        body = bodies.get(pattern.name)
+        routes[pattern.name] = ('post' if body else 'get', url, body)
+    method, url, body = routes['search']
+    routes['search'] = (
+        method, url + '?' + urlencode({'q': post.text.split()[0]}), body)
+    return routes
+
+
+def send(client, method, url, body=None):
+    if method == 'post':
+        return client.post(
+            url, json.dumps(body), content_type='application/json')
+    return client.get(url)
+
+
+def is_ok(status):
+    """Успешный ответ или редирект; остальное — ошибка маршрута,
+    а не замер.
+    """
+    return 200 <= status < 400
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(client, url, requests, cold=False, method='get', body=None):
+    timings, queries, sizes, statuses = [], [], [], set()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = send(client, method, url, body)
+            content = (
+                b''.join(response.streaming_content)
+                if response.streaming else response.content
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+        sizes.append(len(content))
+        statuses.add(response.status_code)
+    return {
+        'url': url,
+        'method': method.upper(),
+        'status': sorted(statuses),
+        'ok': all(is_ok(status) for status in statuses),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'queries': round(statistics.mean(queries), 2),
+        'bytes': round(statistics.mean(sizes)),
+    }
+
+
+def run(reader, requests=20, cold=False):
+    client = Client()
+    client.force_login(reader)
+    return {
+        name: measure(client, url, requests, cold, method, body)
+        for name, (method, url, body) in route_requests(reader).items()
+    }
+
+
+def template_settings(loaders):
+    engine = settings.TEMPLATES[0]
+    options = {**engine['OPTIONS'], 'loaders': loaders}
+    return [{**engine, 'OPTIONS': options}, *settings.TEMPLATES[1:]]
+
+
+def render_times(reader, requests=20):
+    """Медиана времени рендеринга шаблонов каждого маршрута
+    в каждом профиле TEMPLATE_PROFILES. Кэш очищается перед
+    запросом, иначе фрагменты ленты не рендерятся вовсе.
+    """
+    client = Client()
+    client.force_login(reader)
+    routes = route_requests(reader)
+    results = {name: {} for name in routes}
+    for profile, loaders in settings.TEMPLATE_PROFILES.items():
+        with override_settings(TEMPLATES=template_settings(loaders)):
+            for name, (method, url, body) in routes.items():
+                timings = []
+                for _ in range(requests):
+                    cache.clear()
+                    request_profile = RequestProfile()
+                    with request_profile.activate():
+                        send(client, method, url, body)
+                    timings.append(request_profile.template_ms)
+                results[name][profile] = round(
+                    statistics.median(timings), 3)
+    return results
+
+
+def compare(results, baseline):
+    """Относительное изменение метрик к прошлому прогону."""
+    changes = {}
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            key: round((metrics[key] - previous[key]) / previous[key] * 100, 1)
+            for key in ('p50_ms', 'p95_ms', 'queries', 'bytes')
+            if previous.get(key)
+        }
+    return changes
@@ -0,0 +1,219 @@
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import translation
+from django.utils.timezone import utc
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from core.cache import make_key
+from core.db import mark_primary_write, replica_lagging
+
+from .models import Group, Post, User
+
+
+SITE_SCOPE = 'site'
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(user_id):
+    return f'author:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post_id, author_id, *group_ids):
+    """Области, которые меняет правка поста: главная, сам пост,
+    страницы автора (и все его посты — на них счетчик постов)
+    и групп.
+    """
+    return (
+        INDEX_SCOPE, post_scope(post_id), author_scope(author_id),
+        *(group_scope(group_id) for group_id in group_ids if group_id),
+    )
+
+
+def feed_generation_key(scope=SITE_SCOPE):
+    return make_key('posts', 'feed_generation', scope)
+
+
+def get_feed_generations(scopes):
+    """Поколения областей лент: входят в ключи страниц, фрагментов
+    и ETag, поэтому сдвиг поколения делает устаревшими только
+    страницы своей области. SITE_SCOPE входит во все страницы.
+    Начальное значение берется от времени, чтобы после вытеснения
+    ключа не совпасть со старыми фрагментами.
+    """
+    keys = [feed_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        generations.update(cache.get_many(missing))
+    return [generations.get(key, 0) for key in keys]
+
+
+def get_feed_generation(scope=SITE_SCOPE):
+    return get_feed_generations([scope])[0]
+
+
+def bump_feed_generation(*scopes):
+    """Сдвигает поколения областей (по умолчанию — всего сайта).
+    Внутри транзакции сдвиг повторяется после коммита: запрос между
+    первым сдвигом и коммитом мог положить в кэш старые данные под
+    новым поколением. Новое поколение — время сдвига, поэтому оно же
+    служит Last-Modified.
+    """
+    scopes = scopes or (SITE_SCOPE,)
+
+    def bump():
+        generation = time.time_ns()
+        cache.set_many({
+            feed_generation_key(scope): generation for scope in scopes
+        }, None)
+
+    def bump_committed():
+        bump()
+        mark_primary_write()
+
+    if transaction.get_connection().in_atomic_block:
+        bump()
+    transaction.on_commit(bump_committed)
+
+
+def cached_column(model, column, **lookup):
+    """Значение column объекта по полю из адреса страницы, в кэше
+    без срока: области страницы определяются без запросов к базе.
+    Сигналы сбрасывают значение при сохранении объекта
+    (forget_column).
+    """
+    (field, value), = lookup.items()
+    key = make_key(
+        'posts', 'column', model._meta.model_name, column, field, value)
+    result = cache.get(key)
+    if result is None:
+        result = model.objects.filter(**lookup).values_list(
+            column, flat=True).first()
+        if result is not None:
+            cache.set(key, result, None)
+    return result
+
+
+def forget_column(model, column, **lookup):
+    (field, value), = lookup.items()
+    cache.delete(make_key(
+        'posts', 'column', model._meta.model_name, column, field, value))
+
+
+def page_scopes(match):
+    """Области, от которых зависит страница, по аргументам ее
+    маршрута: группа, автор или пост. Пост зависит и от автора —
+    на странице поста выводится счетчик его постов.
+    """
+    kwargs = match.kwargs
+    if 'slug' in kwargs:
+        group_id = cached_column(Group, 'pk', slug=kwargs['slug'])
+        scopes = [group_scope(group_id)]
+    elif 'username' in kwargs:
+        user_id = cached_column(User, 'pk', username=kwargs['username'])
+        scopes = [author_scope(user_id)]
+    elif 'post_id' in kwargs:
+        author_id = cached_column(Post, 'author_id', pk=kwargs['post_id'])
+        scopes = [post_scope(kwargs['post_id']), author_scope(author_id)]
+    else:
+        scopes = [INDEX_SCOPE]
+    return [SITE_SCOPE, *scopes]
+
+
+def page_generation(match):
+    return '.'.join(map(str, get_feed_generations(page_scopes(match))))
+
+
+def feed_cache_context(request):
+    """Ключ фрагмента ленты: поколения ее областей, путь (группа
+    или автор) и позиция страницы. Фрагмент по отстающей реплике
+    не кэшируется.
+    """
+    key = ':'.join((
+        page_generation(request.resolver_match),
+        request.path,
+        request.GET.get('cursor', ''),
+        request.GET.get('page', ''),
+    ))
+    return {
+        'feed_cache_key': key,
+        'feed_cache_timeout': (
+            0 if replica_lagging(request) else settings.FEED_CACHE_TIMEOUT),
+    }
+
+
+def feed_etag(request, *args, **kwargs):
+    """ETag страницы без запросов к базе: поколения ее областей
+    меняются при правке постов, комментариев, групп и подписок, а
+    пользователь и адрес с курсором отличают разные версии страницы.
+    """
+    parts = (
+        page_generation(request.resolver_match),
+        request.get_full_path(),
+        request.user.pk or '',
+    )
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_last_modified(request, *args, **kwargs):
+    """Поколение — время последнего сдвига в наносекундах."""
+    generation = max(get_feed_generations(
+        page_scopes(request.resolver_match)))
+    return datetime.datetime.fromtimestamp(generation / 10 ** 9, tz=utc)
+
+
+def conditional_feed(view):
+    """Отвечает 304 на If-None-Match/If-Modified-Since, не вызывая
+    view. no-cache заставляет браузер перепроверять страницу
+    при каждом открытии, а не показывать ее по эвристике.
+    Страница по отстающей реплике уходит без валидаторов, иначе
+    браузер получал бы 304 на нее до следующей правки.
+    """
+    conditional = condition(
+        etag_func=feed_etag, last_modified_func=feed_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        if replica_lagging(request):
+            del response['ETag']
+            del response['Last-Modified']
+        return response
+    return cache_control(no_cache=True)(wrapper)
+
+
+def anonymous_page(view):
+    """Помечает view для кэша целых страниц гостей
+    (см. AnonymousPageCacheMiddleware).
+    """
+    view.anonymous_page = True
+    return view
+
+
+def page_cache_key(request, match):
+    """Поколения областей в ключе сбрасывают страницы теми же
+    событиями, что и фрагменты и ETag.
+    """
+    return make_key(
+        'posts', 'page',
+        page_generation(match),
+        translation.get_language(),
+        request.get_full_path(),
+    )
@@ -0,0 +1,8 @@
+class FeedFormatConverter:
+    regex = 'json|rss|atom'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
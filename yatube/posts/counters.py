@@ -0,0 +1,52 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Counter, Follow, Group, Post, User
+
+
+def count_subquery(model, field):
+    """Подзапрос COUNT(*) по связанной модели для UPDATE ... SET."""
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно сдвигает счетчик без чтения строки в Python."""
+    if pk is None:
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def get_user_counter(user):
+    try:
+        return user.counter
+    except Counter.DoesNotExist:
+        rebuild_user_counters(User.objects.filter(pk=user.pk))
+        return Counter.objects.get(user=user)
+
+
+def rebuild_user_counters(users=None):
+    users = User.objects.all() if users is None else users
+    Counter.objects.bulk_create(
+        (Counter(user_id=pk) for pk in users.filter(
+            counter__isnull=True).values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    Counter.objects.filter(user__in=users).update(
+        posts_count=count_subquery(Post, 'author'),
+        followers_count=count_subquery(Follow, 'author'),
+        following_count=count_subquery(Follow, 'user'),
+    )
+
+
+def rebuild_counters():
+    rebuild_user_counters()
+    Group.objects.update(posts_count=count_subquery(Post, 'group'))
+    Post.objects.update(comments_count=count_subquery(Comment, 'post'))
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Counter, FeedItem, Follow, Post
+
+
+def is_fanout_author(author_id):
+    """Посты авторов с огромным числом подписчиков не раскладываются
+    по лентам, а дочитываются при открытии ленты.
+    """
+    return not Counter.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FOLLOW_FANOUT_LIMIT,
+    ).exists()
+
+
+def pulled_condition(prefix=''):
+    """Авторы, чьи посты дочитываются: сейчас у них не меньше
+    FOLLOW_FANOUT_LIMIT подписчиков или так было при публикации
+    одного из постов (Counter.pulled), и этих постов нет в лентах.
+    """
+    limit = settings.FOLLOW_FANOUT_LIMIT
+    return (
+        Q(**{f'{prefix}followers_count__gte': limit})
+        | Q(**{f'{prefix}pulled': True})
+    )
+
+
+def fan_out_post(post):
+    if not is_fanout_author(post.author_id):
+        Counter.objects.filter(
+            user_id=post.author_id, pulled=False).update(pulled=True)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim_feeds(followers)
+
+
+def trim_feed(user_id):
+    """Оставляет в ленте только FOLLOW_FEED_SIZE последних постов
+    одним DELETE по индексу ленты.
+    """
+    stale = FeedItem.objects.filter(user_id=user_id).order_by(
+        '-pub_date', '-post_id'
+    ).values('pk')[settings.FOLLOW_FEED_SIZE:]
+    FeedItem.objects.filter(pk__in=stale).delete()
+
+
+def trim_feeds(user_ids):
+    """trim_feed для многих лент одним DELETE: записи нумеруются
+    окном ROW_NUMBER() внутри каждой ленты, удаляются те, что дальше
+    FOLLOW_FEED_SIZE. Ленты не длиннее лимита не меняются.
+    """
+    ranked = FeedItem.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('post_id').desc()],
+        ),
+    ).values('pk', 'position')
+    sql, params = ranked.query.sql_with_params()
+    table = connection.ops.quote_name(FeedItem._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ({sql}) WHERE position > %s)',
+            (*params, settings.FOLLOW_FEED_SIZE),
+        )
+
+
+def backfill_feed(user_id, author_id):
+    backfill_feeds(user_id, [author_id])
+
+
+def backfill_feeds(user_id, author_ids):
+    """Добавляет в ленту последние посты сразу нескольких авторов
+    одним запросом: после обрезки в ленте все равно остается
+    только FOLLOW_FEED_SIZE самых новых.
+    """
+    pulled = set(Counter.objects.filter(
+        pulled_condition(), user_id__in=author_ids,
+    ).values_list('user_id', flat=True))
+    author_ids = set(author_ids) - pulled
+    if not author_ids:
+        return
+    posts = Post.objects.filter(author_id__in=author_ids).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.FOLLOW_FEED_SIZE]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim_feed(user_id)
+
+
+def drop_from_feed(user_id, author_id):
+    drop_from_feeds(user_id, [author_id])
+
+
+def drop_from_feeds(user_id, author_ids):
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids).delete()
+
+
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def followed_posts(user):
+    """Посты из входящей ленты плюс посты подписок, которые
+    не раскладываются (см. pulled_condition), в порядке
+    FEED_ORDERING. Без таких подписок запрос идет от индекса
+    ленты (user, -pub_date, -post) и берет посты по ключу.
+    """
+    pulled_authors = list(Follow.objects.filter(
+        pulled_condition('author__counter__'), user=user,
+    ).values_list('author_id', flat=True))
+    if not pulled_authors:
+        posts = Post.objects.filter(feed_items__user=user).annotate(
+            feed_date=F('feed_items__pub_date'),
+            feed_post=F('feed_items__post_id'),
+        )
+        return posts.order_by(*FEED_ORDERING)
+    condition = Q(pk__in=FeedItem.objects.filter(
+        user=user).values('post_id')) | Q(author_id__in=pulled_authors)
+    # Те же имена ключа, что и у ленты: курсоры не ломаются, когда
+    # подписка на дочитываемого автора появляется или исчезает.
+    posts = Post.objects.filter(condition).annotate(
+        feed_date=F('pub_date'), feed_post=F('id'))
+    return posts.order_by(*FEED_ORDERING)
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .caching import author_scope, bump_feed_generation
+from .counters import change_counter, rebuild_user_counters
+from .feeds import backfill_feeds, drop_from_feeds
+from .models import Counter, Follow, User
+
+
+def resolve_authors(user, usernames):
+    """id авторов по username одним запросом, без самого
+    пользователя: на себя подписаться нельзя.
+    """
+    return dict(
+        User.objects.filter(username__in=usernames)
+        .exclude(pk=user.pk)
+        .values_list('pk', 'username')
+    )
+
+
+def lock_follower(user):
+    """Блокирует строку счетчика подписчика до конца транзакции:
+    все изменения подписок одного пользователя идут по очереди,
+    поэтому прочитанный followed_ids совпадает с тем, что будет
+    вставлено или удалено. SQLite и так выполняет запись по одной.
+    """
+    list(Counter.objects.select_for_update().filter(
+        user_id=user.pk).values_list('pk', flat=True))
+
+
+def followed_ids(user, author_ids):
+    return set(Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+@transaction.atomic
+def follow_authors(user, usernames):
+    """Подписывает на всех авторов из списка. bulk_create обходит
+    сигналы, поэтому счетчики, ленты и поколение лент обновляются
+    здесь же, одним запросом на каждую таблицу.
+    """
+    authors = resolve_authors(user, usernames)
+    lock_follower(user)
+    new_ids = set(authors) - followed_ids(user, authors)
+    if new_ids:
+        Follow.objects.bulk_create(
+            (Follow(user=user, author_id=author_id) for author_id in new_ids),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        Counter.objects.filter(user_id__in=new_ids).update(
+            followers_count=F('followers_count') + 1)
+        change_counter(Counter, user.pk, 'following_count', len(new_ids))
+        backfill_feeds(user.pk, new_ids)
+        bump_feed_generation(*map(author_scope, {user.pk, *new_ids}))
+    return authors, len(new_ids)
+
+
+@transaction.atomic
+def unfollow_authors(user, usernames):
+    authors = resolve_authors(user, usernames)
+    lock_follower(user)
+    old_ids = followed_ids(user, authors)
+    deleted = 0
+    if old_ids:
+        # Публичный delete() отправил бы post_delete на каждую строку,
+        # а сигналы сделали бы то же, что код ниже, но построчно.
+        # _raw_delete безопасен: на Follow не ссылается ни одна модель,
+        # каскадов нет, а производные данные обновляются здесь.
+        follows = Follow.objects.filter(user=user, author_id__in=old_ids)
+        deleted = follows._raw_delete(follows.db)
+        if deleted == len(old_ids):
+            change_counter(Counter, user.pk, 'following_count', -deleted)
+            Counter.objects.filter(user_id__in=old_ids).update(
+                followers_count=Greatest(F('followers_count') - 1, 0))
+        else:
+            # Часть строк удалили в обход lock_follower: какие именно,
+            # неизвестно, поэтому счетчики пересчитываются по таблице.
+            rebuild_user_counters(
+                User.objects.filter(pk__in=old_ids | {user.pk}))
+        drop_from_feeds(user.pk, old_ids)
+        bump_feed_generation(*map(author_scope, {user.pk, *old_ids}))
+    return authors, deleted
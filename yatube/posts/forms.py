@@ -1,6 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
 from .models import Comment, Post
+from .uploads import prepare_image
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +12,31 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанный LimitedUploadHandler файл не отдается ImageField,
+        # иначе вместо ошибки о размере будет ошибка о формате.
+        self.image_too_large = getattr(
+            self.files.get('image'), 'too_large', False)
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return prepare_image(image)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_too_large:
+            self.add_error('image', (
+                'Картинка не должна быть больше '
+                f'{filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)}'
+            ))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
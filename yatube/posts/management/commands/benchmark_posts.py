@@ -0,0 +1,104 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Засеивает временную тестовую базу и замеряет p50/p95, число '
+        'запросов и размер ответа для каждого маршрута posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--templates', action='store_true',
+            help='Сравнить время рендеринга в профилях TEMPLATE_PROFILES.',
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument('--baseline', help='JSON прошлого прогона.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            reader = benchmark.seed(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+            )
+            if options['templates']:
+                results = benchmark.render_times(reader, options['requests'])
+            else:
+                results = benchmark.run(
+                    reader, options['requests'], options['cold'])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+        if options['templates']:
+            self.print_render_times(results)
+        else:
+            self.print_results(results)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as stream:
+                changes = benchmark.compare(results, json.load(stream))
+            self.print_changes(changes)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, indent=2, ensure_ascii=False)
+        failed = [
+            name for name, metrics in results.items()
+            if not options['templates'] and not metrics['ok']
+        ]
+        if failed:
+            raise CommandError(
+                'Маршруты ответили ошибкой: ' + ', '.join(failed))
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"маршрут":<18}{"статус":>10}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"байт":>10}')
+        for name, metrics in results.items():
+            status = '/'.join(map(str, metrics['status']))
+            line = (
+                f'{name:<18}{status:>10}'
+                f'{metrics["p50_ms"]:>10}{metrics["p95_ms"]:>10}'
+                f'{metrics["queries"]:>10}{metrics["bytes"]:>10}'
+            )
+            self.stdout.write(
+                line if metrics['ok'] else self.style.ERROR(line))
+
+    def print_render_times(self, results):
+        profiles = list(next(iter(results.values())))
+        self.stdout.write(
+            f'{"маршрут":<18}'
+            + ''.join(f'{profile + ", мс":>14}' for profile in profiles))
+        for name, timings in results.items():
+            self.stdout.write(
+                f'{name:<18}'
+                + ''.join(f'{timings[profile]:>14}' for profile in profiles))
+
+    def print_changes(self, changes):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING('Изменение к базовому, %'))
+        for name, metrics in changes.items():
+            line = ', '.join(
+                f'{key} {value:+}' for key, value in metrics.items())
+            self.stdout.write(f'  {name}: {line}')
@@ -0,0 +1,182 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.counters import rebuild_counters
+from posts.feeds import backfill_feeds, followed_posts
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.utils import post_comments
+
+
+# Составные индексы горячих запросов: --compare показывает
+# планы тех же запросов без них.
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'feeditem_user_pub_date_idx',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает план и время горячих запросов лент. С --compare '
+        'затем показывает те же запросы без составных индексов: они '
+        'удаляются в транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сначала создать столько постов на тестовых данных.',
+        )
+        parser.add_argument(
+            '--runs', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос для замера.',
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Повторить запросы без составных индексов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        post = Post.objects.order_by('-comments_count').first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            self.stderr.write('Нет данных: запустите команду с --seed N')
+            return
+        limit = settings.LIMIT_POSTS
+        pages = {
+            'index': (Post.objects.select_related('author', 'group'), {}),
+            'profile': (
+                post.author.posts.select_related('group'), {}),
+            'group': (
+                Post.objects.filter(group_id=post.group_id)
+                .select_related('author', 'group'),
+                {},
+            ),
+            'follow': (
+                followed_posts(follow.user).select_related('author', 'group'),
+                {'tiebreaker': 'feed_post'},
+            ),
+        }
+        paginators = {
+            name: CursorPaginator(posts, limit, **kwargs)
+            for name, (posts, kwargs) in pages.items()
+        }
+        paginators['comments'] = CursorPaginator(
+            post_comments(post), settings.LIMIT_COMMENTS)
+        following = Follow.objects.filter(
+            user_id=follow.user_id, author_id=follow.author_id)
+        self.explain_all(paginators, following, options['runs'])
+        if options['compare']:
+            self.stdout.write(self.style.WARNING('Без составных индексов:'))
+            with transaction.atomic():
+                self.drop_feed_indexes()
+                # sqlite3 кэширует подготовленные запросы по тексту,
+                # а EXPLAIN не перепланируется после DROP INDEX:
+                # комментарий делает текст другим.
+                self.explain_all(
+                    paginators, following, options['runs'],
+                    comment='/* без индексов */ ')
+                transaction.set_rollback(True)
+
+    def explain_all(self, paginators, following, runs, comment=''):
+        for name, paginator in paginators.items():
+            self.explain_pages(name, paginator, runs, comment)
+        self.explain('following', following, runs, comment)
+
+    def drop_feed_indexes(self):
+        """DROP INDEX внутри транзакции: после отката индексы
+        и данные остаются как были, миграции не откатываются.
+        """
+        with connection.cursor() as cursor:
+            for name in FEED_INDEXES:
+                cursor.execute(
+                    f'DROP INDEX {connection.ops.quote_name(name)}')
+
+    def explain_pages(self, name, paginator, runs, comment=''):
+        """Запросы первой и следующей страницы в том виде,
+        в каком их выполняют представления.
+        """
+        limit = paginator.per_page + 1
+        self.explain(
+            name, paginator.cursor_queryset()[2][:limit], runs, comment)
+        cursor = paginator.cursor_page().next_cursor
+        if cursor:
+            self.explain(
+                f'{name}, следующая страница',
+                paginator.cursor_queryset(cursor)[2][:limit],
+                runs,
+                comment,
+            )
+
+    def explain(self, name, queryset, runs, comment=''):
+        sql, params = queryset.query.sql_with_params()
+        prefix = (
+            'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+            else 'EXPLAIN '
+        ) + comment
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            plan = [' '.join(str(col) for col in row)
+                    for row in cursor.fetchall()]
+            started = time.perf_counter()
+            for _ in range(runs):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            elapsed = (time.perf_counter() - started) / runs * 1000
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: {elapsed:.2f} мс'))
+        for line in plan:
+            self.stdout.write(f'  {line}')
+
+    @transaction.atomic
+    def seed(self, count):
+        users = User.objects.bulk_create(
+            User(username=f'bench_{time.time_ns()}_{i}')
+            for i in range(max(count // 100, 2))
+        )
+        users = list(User.objects.filter(
+            username__in=[user.username for user in users]))
+        groups = Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'bench-{time.time_ns()}-{i}')
+            for i in range(10)
+        )
+        groups = list(Group.objects.filter(
+            slug__in=[group.slug for group in groups]))
+        Post.objects.bulk_create(
+            (Post(
+                text=f'Пост {i}',
+                author=random.choice(users),
+                group=random.choice(groups),
+            ) for i in range(count)),
+            batch_size=500,
+        )
+        post_ids = list(
+            Post.objects.values_list('pk', flat=True)[:count // 10 or 1])
+        Comment.objects.bulk_create(
+            (Comment(
+                post_id=random.choice(post_ids),
+                author=random.choice(users),
+                text=f'Комментарий {i}',
+            ) for i in range(count)),
+            batch_size=500,
+        )
+        Follow.objects.bulk_create(
+            (Follow(user=user, author=author)
+             for user in users[:50] for author in users[:50]
+             if user != author),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        rebuild_counters()
+        for user in users[:50]:
+            backfill_feeds(user.pk, [author.pk for author in users[:50]])
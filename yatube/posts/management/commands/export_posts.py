@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import COLUMNS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии или подписки в JSONL/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(COLUMNS))
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, `-` — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        stream = (
+            sys.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8', newline='')
+        )
+        started = time.perf_counter()
+        try:
+            count = write_rows(
+                export_rows(kind), stream, options['format'], kind)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено {count} строк за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else 0:.0f} строк/с)')
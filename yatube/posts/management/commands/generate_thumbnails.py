@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры всех размеров для уже загруженных картинок.'
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True)
+        count = 0
+        for name in images.order_by().distinct().iterator():
+            try:
+                generate_thumbnails(name)
+            except Exception as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {count}'))
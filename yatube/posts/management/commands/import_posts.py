@@ -0,0 +1,59 @@
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.transfer import COLUMNS, Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает посты, комментарии или подписки из JSONL/CSV '
+        'через bulk_create. Авторы и группы ищутся по username и slug.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(COLUMNS))
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для загрузки, `-` — стандартный ввод.',
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        importer = Importer(options['kind'])
+        rows = read_rows(stream, options['format'])
+        started = time.perf_counter()
+        try:
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    importer.import_batch(batch)
+                if options['verbosity'] > 1:
+                    self.stderr.write(self.report(importer, started))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        with transaction.atomic():
+            importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            self.report(importer, started)))
+
+    def report(self, importer, started):
+        elapsed = time.perf_counter() - started
+        rate = importer.imported / elapsed if elapsed else 0
+        return (
+            f'Загружено {importer.imported}, пропущено {importer.skipped} '
+            f'за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        )
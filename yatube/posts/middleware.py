@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core.db import replica_lagging
+
+from .caching import page_cache_key
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц для гостей. Стоит первым в MIDDLEWARE:
+    попадание отдается до сессий, аутентификации и сообщений.
+    Гость — запрос без cookie сессии; для всех гостей страница
+    одинакова, потому что личные части шаблонов (вкладки ленты,
+    форма комментария) выводятся только вошедшим. Страницы,
+    отрисованные по отстающей реплике, в кэш не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def cacheable_match(self, request):
+        """Маршрут страницы, если ее можно отдать из кэша, иначе None."""
+        if (
+            request.method not in SAFE_METHODS
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return match if getattr(match.func, 'anonymous_page', False) else None
+
+    def __call__(self, request):
+        match = self.cacheable_match(request)
+        if match is None:
+            return self.get_response(request)
+        key = page_cache_key(request, match)
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')),
+                response=response,
+            )
+        response = self.get_response(request)
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not replica_lagging(request)
+        ):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Схема индекса зафиксирована здесь, а не берется из posts.search:
+# миграция должна давать ту же таблицу, как бы ни менялся код поиска.
+CREATE_INDEX = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+    "USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+)
+FILL_INDEX = (
+    'INSERT INTO posts_post_fts (rowid, text) SELECT id, text FROM posts_post'
+)
+DROP_INDEX = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def fts_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def build_search_index(apps, schema_editor):
+    if fts_available(schema_editor.connection):
+        schema_editor.execute(CREATE_INDEX)
+        schema_editor.execute(FILL_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if fts_available(schema_editor.connection):
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_moderation_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='feeditem',
+            name='feeditem_user_pub_date_idx',
+        ),
+        migrations.AddField(
+            model_name='counter',
+            name='pulled',
+            field=models.BooleanField(default=False, help_text='Часть постов не разложена по лентам подписчиков', verbose_name='Посты дочитываются'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feeditem_user_pub_date_idx'),
+        ),
+    ]
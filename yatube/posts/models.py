@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .uploads import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -8,6 +11,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
@@ -40,19 +48,54 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         help_text='Загрузите картинку'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+        help_text='Растет при каждом изменении поста и его миниатюр',
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -68,6 +111,14 @@ class Comment(models.Model):
     text = models.TextField('Комментарий')
     created = models.DateTimeField('Дата комментария', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -80,3 +131,121 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+
+
+class Counter(models.Model):
+    """Денормализованные счетчики пользователя: обновляются сигналами
+    при записи Post и Follow и пересчитываются rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counter',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    pulled = models.BooleanField(
+        'Посты дочитываются',
+        default=False,
+        help_text='Часть постов не разложена по лентам подписчиков',
+    )
+
+
+class FeedItem(models.Model):
+    """Входящая лента подписчика: пост кладется сюда при публикации,
+    чтобы follow_index читал ограниченный индекс, а не джойнил подписки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feeditem_user_pub_date_idx',
+            ),
+        ]
+
+
+class StoredImage(models.Model):
+    """Файл картинки в ContentAddressedStorage. Сохранение и удаление
+    файла сначала пишут в его строку, поэтому в разных процессах они
+    идут по очереди: блокировка записи держится до коммита.
+    """
+    name = models.CharField('Файл', max_length=255, unique=True)
+    saved = models.DateTimeField('Последнее сохранение', default=timezone.now)
+
+
+class ModerationJob(models.Model):
+    """Массовое действие модератора из админки. Выполняется
+    в фоне порциями (posts.moderation), прогресс — done из total.
+    """
+    DELETE_POSTS = 'delete_posts'
+    DELETE_AUTHOR_POSTS = 'delete_author_posts'
+    MOVE_POSTS = 'move_posts'
+    DELETE_COMMENTS = 'delete_comments'
+    PURGE_COMMENTS = 'purge_comments'
+    ACTIONS = (
+        (DELETE_POSTS, 'Удаление постов'),
+        (DELETE_AUTHOR_POSTS, 'Удаление всех постов авторов'),
+        (MOVE_POSTS, 'Перенос постов в группу'),
+        (DELETE_COMMENTS, 'Удаление комментариев'),
+        (PURGE_COMMENTS, 'Удаление комментариев по тексту'),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    action = models.CharField('Действие', max_length=32, choices=ACTIONS)
+    params = models.TextField('Параметры', default='{}')
+    status = models.CharField(
+        'Статус', max_length=16, choices=STATUSES, default=PENDING)
+    total = models.PositiveIntegerField('Всего', default=0)
+    done = models.PositiveIntegerField('Обработано', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='moderation_jobs',
+        verbose_name='Модератор',
+    )
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Задача модерации'
+        verbose_name_plural = 'Задачи модерации'
+
+    def __str__(self):
+        return f'{self.get_action_display()} №{self.pk}'
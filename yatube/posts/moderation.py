@@ -0,0 +1,151 @@
+import json
+import logging
+
+from django.conf import settings
+from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.jobs import heartbeat, task
+
+from .caching import bump_feed_generation
+from .counters import change_counter, count_subquery
+from .models import Comment, Counter, FeedItem, Group, ModerationJob, Post
+from .search import unindex_posts
+from .thumbnails import release_image
+
+logger = logging.getLogger(__name__)
+
+
+def selection_queryset(model, selection):
+    """Выборка задачи по JSON из ModerationAdmin.selection: список id
+    отмеченных строк или, при «выбрать все», фильтры и поиск списка,
+    которые применяются заново так же, как в админке.
+    """
+    if 'ids' in selection:
+        return model.objects.filter(pk__in=selection['ids'])
+    model_admin = admin.site._registry[model]
+    filters = selection['filters']
+    for lookup, value in filters.items():
+        if not model_admin.lookup_allowed(lookup, value):
+            raise ValueError(f'Недопустимый фильтр {lookup}')
+    queryset, use_distinct = model_admin.get_search_results(
+        None, model.objects.filter(**filters), selection['search'])
+    return queryset.distinct() if use_distinct else queryset
+
+
+def change_counters(model, field, queryset, key, sign=-1):
+    """Сдвигает счетчики на число строк порции по каждому значению
+    key: один GROUP BY и UPDATE на каждого автора или группу.
+    """
+    totals = queryset.order_by().values(key).annotate(total=Count('pk'))
+    for row in totals:
+        change_counter(model, row[key], field, sign * row['total'])
+
+
+def delete_posts(post_ids):
+    """Удаляет посты с комментариями и записями лент без загрузки
+    объектов и сигналов, затем поправляет производные данные.
+    """
+    posts = Post.objects.filter(pk__in=post_ids)
+    change_counters(Counter, 'posts_count', posts, 'author_id')
+    change_counters(Group, 'posts_count', posts, 'group_id')
+    images = set(posts.exclude(image='').exclude(image=None).values_list(
+        'image', flat=True))
+    for model in (Comment, FeedItem):
+        related = model.objects.filter(post_id__in=post_ids)
+        related._raw_delete(related.db)
+    unindex_posts(post_ids)
+    posts._raw_delete(posts.db)
+    for name in images:
+        release_image(name)
+
+
+def move_posts(post_ids, group_id):
+    posts = Post.objects.filter(pk__in=post_ids).exclude(group_id=group_id)
+    change_counters(Group, 'posts_count', posts, 'group_id')
+    change_counter(Group, group_id, 'posts_count', posts.count())
+    # Новая версия сбрасывает кэш карточек перенесенных постов.
+    posts.update(group_id=group_id, version=F('version') + 1)
+
+
+def delete_comments(comment_ids):
+    comments = Comment.objects.filter(pk__in=comment_ids)
+    post_ids = set(comments.values_list('post_id', flat=True))
+    comments._raw_delete(comments.db)
+    Post.objects.filter(pk__in=post_ids).update(
+        comments_count=count_subquery(Comment, 'post'))
+
+
+def job_targets(job):
+    """Выборка задачи и обработчик одной порции id."""
+    params = json.loads(job.params)
+    if job.action == ModerationJob.DELETE_POSTS:
+        return selection_queryset(Post, params['selection']), delete_posts
+    if job.action == ModerationJob.DELETE_AUTHOR_POSTS:
+        return (
+            Post.objects.filter(author_id__in=params['authors']),
+            delete_posts,
+        )
+    if job.action == ModerationJob.MOVE_POSTS:
+        return (
+            selection_queryset(Post, params['selection']),
+            lambda ids: move_posts(ids, params['group']),
+        )
+    if job.action == ModerationJob.DELETE_COMMENTS:
+        return (
+            selection_queryset(Comment, params['selection']),
+            delete_comments,
+        )
+    if job.action == ModerationJob.PURGE_COMMENTS:
+        return (
+            Comment.objects.filter(text__icontains=params['text']),
+            delete_comments,
+        )
+    raise ValueError(f'Неизвестное действие {job.action}')
+
+
+@task(max_attempts=1)
+def run_job(job_id):
+    """Обрабатывает выборку порциями по MODERATION_CHUNK_SIZE
+    в порядке pk: каждая порция — своя транзакция, после нее
+    сдвигаются прогресс, поколение лент и блокировка задачи.
+    """
+    jobs = ModerationJob.objects.filter(pk=job_id)
+    try:
+        queryset, handle = job_targets(jobs.get())
+        jobs.update(status=ModerationJob.RUNNING, total=queryset.count())
+        last_pk = 0
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:settings.MODERATION_CHUNK_SIZE]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                handle(ids)
+                jobs.update(done=F('done') + len(ids))
+            bump_feed_generation()
+            heartbeat()
+            last_pk = ids[-1]
+        jobs.update(status=ModerationJob.DONE, finished=timezone.now())
+    except Exception as error:
+        logger.exception('Задача модерации %s завершилась ошибкой', job_id)
+        jobs.update(
+            status=ModerationJob.FAILED,
+            error=str(error),
+            finished=timezone.now(),
+        )
+
+
+def start_job(action, params, user):
+    """Создает задачу модерации и ставит ее выполнение
+    в очередь core.jobs.
+    """
+    job = ModerationJob.objects.create(
+        action=action, params=json.dumps(params), created_by=user)
+    run_job.delay(job.pk)
+    return job
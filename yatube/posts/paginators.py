@@ -0,0 +1,247 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from core.cache import make_key
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд,
+    а для сравнения по ключу нужны микросекунды.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: страница выбирается по ключу сортировки
+    последней показанной записи, а не через OFFSET, поэтому
+    стоимость запроса не зависит от глубины страницы.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None,
+                 approximate_count=False, tiebreaker=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.tiebreaker = tiebreaker
+        self.ordering = self._get_ordering(ordering)
+        self.object_list = self.object_list.order_by(*self.ordering)
+        self.approximate_count = approximate_count
+
+    def _get_ordering(self, ordering):
+        meta = self.object_list.model._meta
+        ordering = list(
+            ordering or self.object_list.query.order_by or meta.ordering)
+        names = [field.lstrip('-') for field in ordering]
+        # tiebreaker — уникальное в выборке поле сортировки,
+        # например id поста из записи ленты.
+        unique = {'pk', meta.pk.name, self.tiebreaker}
+        if not unique.intersection(names):
+            prefix = '-' if ordering and ordering[-1].startswith('-') else ''
+            ordering.append(prefix + meta.pk.name)
+        return tuple(ordering)
+
+    @cached_property
+    def count(self):
+        """При approximate_count число записей берется из кэша
+        и может отставать на PAGINATOR_COUNT_CACHE_TIMEOUT секунд.
+        """
+        if not self.approximate_count:
+            return Paginator.count.func(self)
+        key = make_key(
+            'posts', 'paginator_count', str(self.object_list.query))
+        return cache.get_or_set(
+            key,
+            lambda: Paginator.count.func(self),
+            settings.PAGINATOR_COUNT_CACHE_TIMEOUT,
+        )
+
+    def _field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name in self._field_names()]
+
+    def encode_cursor(self, obj, direction):
+        data = json.dumps([direction, self._key(obj)], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            meta = self.object_list.model._meta
+            names = self._field_names()
+            if (
+                direction not in (NEXT, PREVIOUS)
+                or not isinstance(values, list)
+                or len(values) != len(names)
+                or not all(
+                    isinstance(value, (str, int, float))
+                    and not isinstance(value, bool)
+                    for value in values
+                )
+            ):
+                raise InvalidCursor(cursor)
+            annotations = self.object_list.query.annotations
+            values = [
+                meta.pk.to_python(value) if name == 'pk'
+                else annotations[name].output_field.to_python(value)
+                if name in annotations
+                else meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except (TypeError, ValueError, binascii.Error,
+                ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+        if None in values:
+            # Пустое значение не сравнивается в SQL.
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _keyset_filter(self, values, reverse):
+        """Условие «после ключа» в форме, которую база ведет
+        по индексу: a <= x AND (a < x OR (b <= y AND (b < y OR ...))).
+        Без внешнего a <= x SQLite разбирает OR на несколько
+        обращений к индексу и сортирует результат заново.
+        """
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            strict = Q(**{name + ('__lt' if descending else '__gt'): value})
+            if condition is None:
+                condition = strict
+                continue
+            loose = Q(**{name + ('__lte' if descending else '__gte'): value})
+            condition = loose & (strict | condition)
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        ]
+
+    def cursor_queryset(self, cursor=None):
+        """Записи после (или до) записи из курсора, без среза.
+        Некорректный или пустой курсор дает записи с начала.
+        """
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        queryset = self.object_list
+        if values is not None and direction == NEXT:
+            queryset = queryset.filter(
+                self._keyset_filter(values, reverse=False))
+        elif values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, reverse=True)
+            ).order_by(*self._reversed_ordering())
+        return direction, values, queryset
+
+    def cursor_page(self, cursor=None):
+        """Возвращает страницу после (или до) записи из курсора."""
+        direction, values, queryset = self.cursor_queryset(cursor)
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        page = Page(items, 1, self)
+        self.attach_cursors(page, has_next, has_previous)
+        return page
+
+    def attach_cursors(self, page, has_next, has_previous):
+        items = page.object_list = list(page.object_list)
+        page.next_cursor = (
+            self.encode_cursor(items[-1], NEXT)
+            if has_next and items else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(items[0], PREVIOUS)
+            if has_previous and items else None
+        )
+        return page
+
+
+def estimated_count(model, using):
+    """Число строк таблицы из статистики планировщика без COUNT(*):
+    sqlite_stat1 после ANALYZE или MAX(rowid), если статистики нет,
+    reltuples у PostgreSQL. None, если оценить нельзя.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] > 0 else None
+            if connection.vendor != 'sqlite':
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+            row = cursor.fetchone()
+            if row:
+                return int(row[0].split()[0])
+    except DatabaseError:
+        # sqlite_stat1 появляется только после первого ANALYZE.
+        pass
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки: без фильтров число записей
+    оценивается по статистике, если таблица не меньше
+    ADMIN_ESTIMATED_COUNT_THRESHOLD, поэтому первая страница
+    открывается без COUNT(*) по всей таблице. Отфильтрованные
+    списки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+        return Paginator.count.func(self)
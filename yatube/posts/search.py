@@ -0,0 +1,126 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+SEARCH_ORDERING = ('rank', '-pk')
+
+_fts_available = {}
+
+
+def fts_available(using=None):
+    """Индекс FTS5 есть только у SQLite, собранной с ENABLE_FTS5,
+    на остальных базах поиск идет по icontains.
+    """
+    using = using or connection
+    if using.alias not in _fts_available:
+        available = using.vendor == 'sqlite'
+        if available:
+            with using.cursor() as cursor:
+                cursor.execute('PRAGMA compile_options')
+                available = ('ENABLE_FTS5',) in cursor.fetchall()
+        _fts_available[using.alias] = available
+    return _fts_available[using.alias]
+
+
+def index_post(post):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    unindex_posts([post_id])
+
+
+def unindex_posts(post_ids):
+    if not fts_available() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            list(post_ids),
+        )
+
+
+def index_posts(post_ids):
+    """Переиндексирует посты из post_ids одним INSERT ... SELECT."""
+    if not fts_available() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            list(post_ids),
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} '
+            f'WHERE id IN ({placeholders})',
+            list(post_ids),
+        )
+
+
+def rebuild_index(using=None):
+    """Переиндексирует все посты одним INSERT ... SELECT."""
+    using = using or connection
+    if not fts_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def match_expression(terms):
+    """Каждое слово запроса ищется как префикс, все слова
+    должны встретиться в тексте.
+    """
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_posts(query, queryset=None):
+    """Посты по запросу с рангом bm25 в поле rank: чем меньше,
+    тем выше пост в выдаче.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    terms = search_terms(query)
+    no_rank = Value(0.0, output_field=FloatField())
+    if not terms:
+        return queryset.annotate(rank=no_rank).none()
+    if not fts_available():
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset.annotate(rank=no_rank)
+    match = match_expression(terms)
+    # MATCH выполняется один раз, а посты присоединяются к его
+    # результату по rowid. Ранг берется из скрытой колонки rank
+    # (bm25) той же строки индекса, а не подзапросом на каждый пост.
+    table = Post._meta.db_table
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = {table}.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[match],
+    ).annotate(rank=RawSQL(
+        f'{SEARCH_TABLE}.rank', (), output_field=FloatField()))
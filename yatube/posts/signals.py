@@ -0,0 +1,175 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import (author_scope, bump_feed_generation, forget_column,
+                      post_scope, post_scopes)
+from .counters import change_counter
+from .feeds import backfill_feed, drop_from_feed, fan_out_post
+from .models import Comment, Counter, Follow, Group, Post, User
+from .search import index_post, unindex_post
+from .thumbnails import release_image, schedule_thumbnails
+
+
+@receiver(post_save, sender=User)
+def create_user_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Counter.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_version(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Post)
+def reload_post_version(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        instance.refresh_from_db(fields=('version',))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, raw=False, **kwargs):
+    """Сдвигает области поста, в том числе прежних группы
+    и автора. Стоит до count_saved_post, который их забывает.
+    """
+    if raw:
+        return
+    loaded_author_id = getattr(instance, '_loaded_author_id', None)
+    bump_feed_generation(
+        *post_scopes(
+            instance.pk, instance.author_id, instance.group_id,
+            getattr(instance, '_loaded_group_id', None),
+        ),
+        *([author_scope(loaded_author_id)]
+          if loaded_author_id not in (None, instance.author_id) else []),
+    )
+    if not created:
+        forget_column(Post, 'author_id', pk=instance.pk)
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    bump_feed_generation(
+        *post_scopes(instance.pk, instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded_group_id = getattr(instance, '_loaded_group_id', None)
+    if created:
+        change_counter(Counter, instance.author_id, 'posts_count', 1)
+        change_counter(Group, instance.group_id, 'posts_count', 1)
+        fan_out_post(instance)
+    elif loaded_group_id != instance.group_id:
+        change_counter(Group, loaded_group_id, 'posts_count', -1)
+        change_counter(Group, instance.group_id, 'posts_count', 1)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_counter(Counter, instance.author_id, 'posts_count', -1)
+    change_counter(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def schedule_new_thumbnails(sender, instance, created, raw=False, **kwargs):
+    """Миниатюры режутся для любой новой картинки: из форм сайта,
+    админки и shell. Импорт ставит их сам (см. transfer).
+    """
+    loaded_image = getattr(instance, '_loaded_image', None)
+    if raw or not instance.image:
+        return
+    if created or loaded_image != instance.image.name:
+        schedule_thumbnails(instance)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw=False, **kwargs):
+    loaded_image = getattr(instance, '_loaded_image', None)
+    if not raw and not created and loaded_image != instance.image.name:
+        release_image(loaded_image)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_counter(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Counter, instance.author_id, 'followers_count', 1)
+        change_counter(Counter, instance.user_id, 'following_count', 1)
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_counter(Counter, instance.author_id, 'followers_count', -1)
+    change_counter(Counter, instance.user_id, 'following_count', -1)
+    drop_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_comments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feed_generation(post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, raw=False, **kwargs):
+    """Подписка меняет счетчики и кнопку подписки на страницах
+    обоих пользователей.
+    """
+    if not raw:
+        bump_feed_generation(
+            author_scope(instance.author_id), author_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    """Название и адрес группы выводятся в карточках на всех
+    страницах, поэтому правка группы сдвигает поколение сайта.
+    """
+    if not raw:
+        forget_column(Group, 'pk', slug=instance.slug)
+        bump_feed_generation()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_username(sender, instance, raw=False, **kwargs):
+    if not raw:
+        forget_column(User, 'pk', username=instance.username)
@@ -0,0 +1,163 @@
+import io
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from core.cache import make_key
+
+from .caching import page_generation
+from .paginators import NEXT, CursorPaginator
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+}
+
+# Класс ленты и закрывающие теги, перед которыми идут записи.
+XML_FEEDS = {
+    'rss': (feedgenerator.Rss201rev2Feed, '</channel></rss>'),
+    'atom': (feedgenerator.Atom1Feed, '</feed>'),
+}
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.SYNDICATION_LIMIT))
+    except ValueError:
+        limit = settings.SYNDICATION_LIMIT
+    return max(1, min(limit, settings.SYNDICATION_MAX_LIMIT))
+
+
+class FeedPage:
+    """Порция ленты после курсора. Курсор следующей порции
+    вычисляется заранее по двум граничным записям, а сами посты
+    читаются через iterator() по мере отдачи ответа.
+    """
+
+    def __init__(self, posts, cursor, limit):
+        paginator = CursorPaginator(posts, limit)
+        _, _, self.queryset = paginator.cursor_queryset(cursor)
+        self.limit = limit
+        edge = list(self.queryset[limit - 1:limit + 1])
+        self.next_cursor = (
+            paginator.encode_cursor(edge[0], NEXT)
+            if len(edge) > 1 else None
+        )
+
+    def __iter__(self):
+        return self.queryset[:self.limit].iterator(chunk_size=100)
+
+
+def post_url(request, post):
+    return request.build_absolute_uri(
+        reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+
+
+def post_data(request, post):
+    return {
+        'id': post.pk,
+        'url': post_url(request, post),
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': (
+            request.build_absolute_uri(post.image.url)
+            if post.image else None
+        ),
+        'comments_count': post.comments_count,
+    }
+
+
+def next_url(request, page):
+    if page.next_cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = page.next_cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def json_chunks(request, page, title):
+    head = {'title': title, 'next': next_url(request, page)}
+    yield json.dumps(head, ensure_ascii=False)[:-1] + ', "items": ['
+    for index, post in enumerate(page):
+        yield (',' if index else '') + json.dumps(
+            post_data(request, post),
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        )
+    yield ']}'
+
+
+def xml_chunks(request, page, feed_format, title, link, description):
+    """Пустая лента пишется целиком и делится по закрывающим тегам,
+    а записи дописываются между частями по одной.
+    """
+    feed_class, closing = XML_FEEDS[feed_format]
+    feed = feed_class(
+        title=title,
+        link=link,
+        description=description,
+        feed_url=request.build_absolute_uri(),
+        language=settings.LANGUAGE_CODE,
+    )
+    buffer = io.StringIO()
+    feed.write(buffer, 'utf-8')
+    document = buffer.getvalue()
+    yield document[:document.rindex(closing)]
+    for post in page:
+        feed.items = []
+        feed.add_item(
+            title=Truncator(post.text).chars(settings.LIMIT_SYMBOL),
+            link=post_url(request, post),
+            description=post.text,
+            unique_id=post_url(request, post),
+            pubdate=post.pub_date,
+            author_name=post.author.get_full_name() or post.author.username,
+            categories=[post.group.title] if post.group else None,
+        )
+        buffer = io.StringIO()
+        feed.write_items(SimplerXMLGenerator(buffer, 'utf-8'))
+        yield buffer.getvalue()
+    yield closing
+
+
+def cached_chunks(key, chunks):
+    """Отдает части ответа и, когда поток дочитан, кладет
+    тело целиком в кэш.
+    """
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(body), settings.FEED_CACHE_TIMEOUT)
+
+
+def feed_response(request, posts, feed_format, title, link,
+                  description=''):
+    """Потоковый ответ ленты. Готовые ленты берутся из кэша
+    по поколениям областей, как фрагменты HTML-страниц.
+    """
+    content_type = CONTENT_TYPES[feed_format]
+    key = make_key('posts', 'syndication',
+                   page_generation(request.resolver_match),
+                   request.build_absolute_uri())
+    body = cache.get(key)
+    if body is not None:
+        return HttpResponse(body, content_type=content_type)
+    page = FeedPage(posts, request.GET.get('cursor'), get_limit(request))
+    if feed_format == 'json':
+        chunks = json_chunks(request, page, title)
+    else:
+        chunks = xml_chunks(request, page, feed_format, title,
+                            request.build_absolute_uri(link), description)
+    return StreamingHttpResponse(
+        cached_chunks(key, chunks), content_type=content_type)
@@ -0,0 +1,45 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import make_key
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+register = template.Library()
+
+
+def card_key(post, show_author):
+    """Кроме (id, версия) ключ содержит поля группы и автора,
+    которые выводит карточка: их правка не сдвигает версию поста.
+    """
+    group_slug = post.group.slug if post.group_id else ''
+    author = (
+        (post.author.username, post.author.get_full_name())
+        if show_author else ()
+    )
+    return make_key(
+        'posts', 'post_card', post.pk, post.version, group_slug, *author)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, show_author=True):
+    """HTML карточек постов. Готовые карточки берутся из кэша
+    одним get_many по (id, версия) и общие для всех лент,
+    рендерятся только недостающие.
+    """
+    posts = list(posts)
+    keys = [card_key(post, show_author) for post in posts]
+    cached = cache.get_many(keys)
+    card_template = context.template.engine.get_template(CARD_TEMPLATE)
+    cards, rendered = [], {}
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            card = rendered[key] = card_template.render(context.new({
+                'post': post,
+                'show_author': show_author,
+            }))
+        cards.append(card)
+    cache.set_many(rendered, settings.FEED_CACHE_TIMEOUT)
+    return cards
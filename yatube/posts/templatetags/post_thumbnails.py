@@ -0,0 +1,17 @@
+from django import template
+
+from ..thumbnails import get_thumbnail
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(image):
+    """Картинка поста из заранее нарезанных миниатюр; пока они
+    не готовы, показывается заглушка.
+    """
+    return {
+        'image': image,
+        'feed': get_thumbnail(image, 'feed'),
+        'mobile': get_thumbnail(image, 'mobile'),
+    }
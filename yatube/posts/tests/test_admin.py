@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import EstimatedCountPaginator, estimated_count
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'user{i}')
+            group = Group.objects.create(title=f'Группа {i}', slug=f'g{i}')
+            post = Post.objects.create(
+                text=f'Пост {i}', author=user, group=group)
+            Comment.objects.create(post=post, author=user, text='Текст')
+            Follow.objects.create(user=user, author=self.admin)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Строки списка не делают запросов к связанным моделям,
+        а поле группы не выводит список всех групп.
+        """
+        for model in (Post, Comment, Follow):
+            self.add_rows(3)
+            small = self.changelist_queries(model)
+            self.add_rows(10)
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.changelist_queries(model), small)
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'Группа 12</option>', count=1)
+
+    def test_search_by_username(self):
+        self.add_rows(2)
+        response = self.admin_client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'user2'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(20))
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10)
+    def test_unfiltered_count_is_estimated(self):
+        """Без фильтров число берется из статистики ANALYZE,
+        а не из COUNT(*).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.create(text='Пост после ANALYZE', author=self.user)
+        paginator = EstimatedCountPaginator(
+            Post.objects.order_by('-pk'), 5)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(paginator.count, 20)
+        self.assertNotIn('COUNT', context.captured_queries[0]['sql'])
+        self.assertEqual(
+            EstimatedCountPaginator(
+                Post.objects.filter(text__startswith='Пост после'), 5
+            ).count,
+            1,
+        )
+
+    def test_small_tables_are_counted_exactly(self):
+        Post.objects.order_by('pk').first().delete()
+        self.assertEqual(estimated_count(Post, 'default'), 20)
+        paginator = EstimatedCountPaginator(Post.objects.order_by('-pk'), 5)
+        self.assertEqual(paginator.count, 19)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.test import TestCase
+
+from .. import benchmark
+from ..urls import urlpatterns
+
+
+class BenchmarkTests(TestCase):
+
+    def test_benchmark_covers_every_route(self):
+        """Бенчмарк замеряет каждый маршрут posts/urls.py."""
+        reader = benchmark.seed(
+            users=3, groups=1, posts=5, comments=5, follows=2)
+        results = benchmark.run(reader, requests=2)
+        self.assertEqual(
+            set(results), {pattern.name for pattern in urlpatterns})
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(metrics['p50_ms'], metrics['p95_ms'])
+                self.assertGreater(metrics['queries'], 0)
+                self.assertTrue(metrics['ok'], metrics['status'])
+        self.assertEqual(results['follow_batch']['method'], 'POST')
+        self.assertEqual(results['follow_batch']['status'], [200])
+
+    def test_render_times_per_template_profile(self):
+        """Время рендеринга замеряется для каждого профиля шаблонов."""
+        reader = benchmark.seed(
+            users=3, groups=1, posts=5, comments=5, follows=2)
+        results = benchmark.render_times(reader, requests=2)
+        for profile in settings.TEMPLATE_PROFILES:
+            with self.subTest(profile=profile):
+                self.assertGreater(results['index'][profile], 0)
+
+    def test_compare_with_baseline(self):
+        """Сравнение выдает изменение метрик в процентах."""
+        results = {'index': {
+            'p50_ms': 15, 'p95_ms': 20, 'queries': 4, 'bytes': 100}}
+        baseline = {'index': {
+            'p50_ms': 10, 'p95_ms': 20, 'queries': 8, 'bytes': 100}}
+        self.assertEqual(
+            benchmark.compare(results, baseline)['index'],
+            {'p50_ms': 50.0, 'p95_ms': 0.0, 'queries': -50.0, 'bytes': 0.0},
+        )
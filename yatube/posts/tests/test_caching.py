@@ -0,0 +1,314 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.db import mark_primary_write, primary_write_key
+
+from ..caching import (INDEX_SCOPE, SITE_SCOPE, author_scope,
+                       get_feed_generation, group_scope, post_scope)
+from ..models import Comment, Follow, Group, Post, User
+from ..templatetags.post_cards import CARD_TEMPLATE
+from .utils import run_on_commit
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(15):
+            Post.objects.create(
+                text=f'Тестовый пост {i:02}', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_each_page_is_cached_separately(self):
+        """Вторая страница не отдает закэшированную первую."""
+        first = self.guest_client.get(reverse('posts:index'))
+        cursor = first.context['page_obj'].next_cursor
+        second = self.guest_client.get(
+            reverse('posts:index'), {'cursor': cursor})
+        self.assertContains(first, 'Тестовый пост 14')
+        self.assertNotContains(second, 'Тестовый пост 14')
+        self.assertContains(second, 'Тестовый пост 00')
+
+    def test_content_changes_bump_their_scopes(self):
+        """Правка сдвигает поколения только тех областей, страницы
+        которых она меняет, и еще раз после коммита.
+        """
+        post = Post.objects.first()
+        reader = User.objects.create_user(username='reader')
+        scopes = (
+            SITE_SCOPE, INDEX_SCOPE, group_scope(self.group.pk),
+            author_scope(self.user.pk), author_scope(reader.pk),
+            post_scope(post.pk),
+        )
+        changes = (
+            ('пост', lambda: Post.objects.create(
+                text='Новый пост', author=self.user, group=self.group),
+             {INDEX_SCOPE, group_scope(self.group.pk),
+              author_scope(self.user.pk)}),
+            ('комментарий', lambda: Comment.objects.create(
+                post=post, author=self.user, text='Комментарий'),
+             {post_scope(post.pk)}),
+            ('подписка', lambda: Follow.objects.create(
+                user=reader, author=self.user),
+             {author_scope(self.user.pk), author_scope(reader.pk)}),
+            ('группа', lambda: Group.objects.get(pk=self.group.pk).save(),
+             {SITE_SCOPE}),
+        )
+        for name, change, changed in changes:
+            with self.subTest(change=name):
+                before = {scope: get_feed_generation(scope)
+                          for scope in scopes}
+                with run_on_commit():
+                    change()
+                    uncommitted = {scope: get_feed_generation(scope)
+                                   for scope in scopes}
+                self.assertEqual(
+                    {scope for scope in scopes
+                     if uncommitted[scope] != before[scope]},
+                    changed,
+                )
+                self.assertEqual(
+                    {scope for scope in scopes
+                     if get_feed_generation(scope) != uncommitted[scope]},
+                    changed,
+                )
+
+    def test_new_post_appears_on_group_page_immediately(self):
+        """Новый пост виден в группе без ожидания TTL."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        with run_on_commit():
+            Post.objects.create(
+                text='Свежий пост', author=self.user, group=self.group)
+        self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            Post.objects.create(
+                text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def card_renders(self, url):
+        response = self.author_client.get(url)
+        return [
+            template.name for template in response.templates
+        ].count(CARD_TEMPLATE)
+
+    def test_card_is_rendered_once_for_all_feeds(self):
+        """Карточка, отрисованная для главной, берется из кэша
+        на странице группы и в результатах поиска.
+        """
+        self.assertEqual(self.card_renders(reverse('posts:index')), 5)
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:search') + '?q=Тестовый',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.card_renders(url), 0)
+
+    def test_edit_invalidates_card(self):
+        """После редактирования перерисовывается только
+        карточка измененного поста.
+        """
+        post = Post.objects.first()
+        self.card_renders(reverse('posts:index'))
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Исправленный пост', 'group': self.group.pk},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertEqual(self.card_renders(url), 1)
+        self.assertContains(self.author_client.get(url), 'Исправленный пост')
+
+    def test_group_slug_change_invalidates_card(self):
+        """Карточка со ссылкой на группу перерисовывается после
+        смены slug группы, хотя версия поста не меняется.
+        """
+        self.card_renders(reverse('posts:index'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed-group'
+        with run_on_commit():
+            group.save()
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            reverse('posts:group_list', kwargs={'slug': 'renamed-group'}),
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Повторный запрос с валидаторами получает 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                for headers in (
+                    {'HTTP_IF_NONE_MATCH': response['ETag']},
+                    {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+                ):
+                    self.assertEqual(
+                        self.guest_client.get(url, **headers).status_code,
+                        304,
+                    )
+
+    def test_changes_invalidate_etag(self):
+        """Подписка дает новую версию страниц автора, комментарий —
+        страницы поста, а остальные страницы отвечают 304. Другой
+        пользователь тоже получает новую версию.
+        """
+        index, group, profile, detail = self.urls
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        follow_urls = [
+            reverse(f'posts:{name}', kwargs={'username': self.user})
+            for name in ('profile_follow', 'profile_unfollow')
+        ]
+        changes = [
+            (lambda url=url: reader_client.get(url), {profile, detail})
+            for url in follow_urls
+        ]
+        changes.append((
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'),
+            {detail},
+        ))
+        for change, changed in changes:
+            etags = {url: self.guest_client.get(url)['ETag']
+                     for url in self.urls}
+            with run_on_commit():
+                change()
+            for url in self.urls:
+                with self.subTest(url=url, changed=changed):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url])
+                    self.assertEqual(
+                        response.status_code,
+                        200 if url in changed else 304,
+                    )
+        etag = self.guest_client.get(index)['ETag']
+        response = reader_client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_guest_pages_are_served_without_queries(self):
+        """Повторная страница для гостя отдается из кэша
+        без запросов к базе, а вошедшему — рендерится.
+        """
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(
+                    self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+                    304,
+                )
+                response = self.authorized_client.get(url)
+                self.assertContains(response, self.user.username)
+                self.assertNotEqual(response.content, first.content)
+
+    def test_content_changes_reach_guests(self):
+        """Новый комментарий сразу виден гостям."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Комментариев: <span>0')
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий')
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Комментариев: <span>1')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_lagging_replica_pages_are_not_cached(self):
+        """Пока реплика может отставать от записи, страницы с нее
+        отдаются без ETag и не попадают ни в кэш страниц, ни в кэш
+        фрагментов.
+        """
+        url = self.urls[0]
+        mark_primary_write()
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Тестовый пост')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        fragment_key = make_template_fragment_key(
+            'feed_page', [response.context['feed_cache_key']])
+        self.assertIsNone(cache.get(fragment_key))
+        cache.delete(primary_write_key())
+        response = self.guest_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertIsNotNone(cache.get(fragment_key))
+        self.assertTrue(response.has_header('ETag'))
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+
+@override_settings(LIMIT_COMMENTS=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(12)
+        )
+        cls.comments = list(cls.post.comments.order_by('created', 'pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_post_detail_renders_first_batch(self):
+        """Страница поста показывает только первую порцию
+        комментариев и кнопку «Показать еще».
+        """
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:5])
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, 'data-comments-url')
+        self.assertNotContains(response, self.comments[5].text)
+
+    def test_load_more_returns_next_batches(self):
+        """Фрагмент отдает порции по курсору до последнего
+        комментария, а в последней порции нет кнопки.
+        """
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        cursor, loaded = None, []
+        for _ in range(3):
+            response = self.author_client.get(
+                url, {'cursor': cursor} if cursor else {})
+            self.assertTemplateNotUsed(response, 'base.html')
+            loaded.extend(response.context['comments'])
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(loaded, self.comments)
+        self.assertIsNone(cursor)
+        self.assertNotContains(response, 'Показать еще')
+
+    def test_batch_queries_do_not_depend_on_depth(self):
+        """Глубокая порция стоит столько же запросов, сколько первая."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        first = self.author_client.get(url)
+        counts = []
+        for params in ({}, {'cursor': first.context['comments'].next_cursor}):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.author_client.get(url, params)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_comments_are_loaded_only_for_author(self):
+        """Комментарии выводятся только автору поста: остальным
+        страница их не загружает, а фрагмент не отдает.
+        """
+        reader_client = Client()
+        reader_client.force_login(
+            User.objects.create_user(username='reader'))
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        for client in (Client(), reader_client):
+            with self.subTest(client=client):
+                response = client.get(detail_url)
+                self.assertNotIn('comments', response.context)
+                self.assertNotContains(response, self.comments[0].text)
+                self.assertEqual(client.get(url).status_code, 403)
+
+    def test_missing_post(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': 0})
+        self.assertEqual(self.author_client.get(url).status_code, 404)
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Counter, Follow, Group, Post, User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def counter(self, user):
+        return Counter.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос в другую группу и удаление поста
+        меняют счетчики автора и групп.
+        """
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый пост', 'group': self.group.pk},
+        )
+        post = Post.objects.get(text='Тестовый пост')
+        self.assertEqual(self.counter(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Тестовый пост', 'group': self.other_group.pk},
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        Post.objects.get(pk=post.pk).delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counter(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарий увеличивает счетчик комментариев поста."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счетчики обоих пользователей."""
+        url_kwargs = {'username': self.author.username}
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs=url_kwargs))
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs=url_kwargs))
+        self.assertEqual(self.counter(self.author).followers_count, 1)
+        self.assertEqual(self.counter(self.reader).following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs=url_kwargs))
+        self.assertEqual(self.counter(self.author).followers_count, 0)
+        self.assertEqual(self.counter(self.reader).following_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """rebuild_counters пересчитывает счетчики после массовых вставок."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author, group=self.group)
+            for i in range(3)
+        )
+        post = Post.objects.first()
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author)])
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий')])
+        Counter.objects.filter(user=self.reader).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.counter(self.author).posts_count, 3)
+        self.assertEqual(self.counter(self.author).followers_count, 1)
+        self.assertEqual(self.counter(self.reader).following_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).comments_count, 1)
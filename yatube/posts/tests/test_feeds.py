@@ -0,0 +1,143 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..feeds import followed_posts
+from ..models import FeedItem, Follow, Post, User
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_page(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается во входящие ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    @override_settings(FOLLOW_FEED_SIZE=2)
+    def test_follow_backfills_and_trims_feed(self):
+        """Подписка добавляет последние посты автора, не больше
+        FOLLOW_FEED_SIZE, а отписка убирает их из ленты.
+        """
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(
+            self.follow_page(), list(Post.objects.order_by('-pub_date')[:2]))
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(FOLLOW_FANOUT_LIMIT=1)
+    def test_popular_author_posts_are_read_on_demand(self):
+        """Посты автора с множеством подписчиков не раскладываются,
+        но все равно попадают в ленту подписки.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertFalse(FeedItem.objects.exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    @override_settings(FOLLOW_FEED_SIZE=2)
+    def test_fan_out_trims_feed(self):
+        """Новые посты вытесняют из ленты самые старые."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(3)
+        ]
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+    @override_settings(FOLLOW_FEED_SIZE=2)
+    def test_fan_out_trims_all_feeds_in_one_statement(self):
+        """Ленты всех подписчиков обрезаются одним DELETE, короткие
+        ленты не теряют записей.
+        """
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(2)
+        ]
+        Follow.objects.create(user=other, author=self.author)
+        FeedItem.objects.filter(user=other).delete()
+        with CaptureQueriesContext(connection) as context:
+            post = Post.objects.create(text='Новый пост', author=self.author)
+        deletes = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_feeditem"')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)),
+            {posts[1].pk, post.pk},
+        )
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=other).values_list(
+                'post_id', flat=True)),
+            [post.pk],
+        )
+
+    @override_settings(FOLLOW_FANOUT_LIMIT=2)
+    def test_pulled_posts_survive_losing_followers(self):
+        """Пост, опубликованный без раскладки, остается в ленте,
+        когда у автора становится меньше FOLLOW_FANOUT_LIMIT
+        подписчиков.
+        """
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertFalse(FeedItem.objects.exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.follow_page(), [post])
+
+    def test_follow_feed_cursor_pages(self):
+        """Курсор ленты подписок ведет на следующую страницу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        second = self.reader_client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(
+            list(first) + list(second),
+            list(Post.objects.order_by('-pub_date', '-id')),
+        )
+
+    def test_feed_query_is_driven_by_feed_index(self):
+        """Лента читается по индексу входящих без сортировки."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        queryset = followed_posts(self.reader).select_related(
+            'author', 'group')[:11]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('feeditem_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
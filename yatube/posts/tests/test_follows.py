@@ -0,0 +1,118 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import rebuild_counters
+from ..models import Counter, FeedItem, Follow, Post, User
+
+
+class FollowBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(20)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text='Тестовый пост', author=author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def batch(self, action, usernames):
+        return self.reader_client.post(
+            reverse('posts:follow_batch'),
+            json.dumps({'action': action, 'usernames': usernames}),
+            content_type='application/json',
+        )
+
+    def counters(self):
+        return dict(Counter.objects.values_list(
+            'user__username', 'followers_count'))
+
+    def test_batch_follow_is_idempotent(self):
+        """Повторная подписка ничего не меняет, а счетчики и лента
+        совпадают с пересчитанными с нуля.
+        """
+        usernames = [author.username for author in self.authors[:5]]
+        response = self.batch('follow', usernames + ['ghost', 'reader'])
+        data = response.json()
+        self.assertEqual(data['following'], usernames)
+        self.assertEqual(data['not_found'], ['ghost'])
+        self.assertEqual(data['changed'], 5)
+        self.assertEqual(data['following_count'], 5)
+        self.assertEqual(self.batch('follow', usernames).json()['changed'], 0)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 5)
+        counters = self.counters()
+        rebuild_counters()
+        self.assertEqual(self.counters(), counters)
+
+    def test_batch_unfollow(self):
+        """Отписка удаляет подписки, ленту и уменьшает счетчики."""
+        usernames = [author.username for author in self.authors[:5]]
+        self.batch('follow', usernames)
+        data = self.batch('unfollow', usernames[:3]).json()
+        self.assertEqual(data['changed'], 3)
+        self.assertEqual(data['following_count'], 2)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 2)
+        counters = self.counters()
+        rebuild_counters()
+        self.assertEqual(self.counters(), counters)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        """Число запросов не зависит от числа авторов в списке."""
+        small = [author.username for author in self.authors[:3]]
+        large = [author.username for author in self.authors[3:]]
+        for action in ('follow', 'unfollow'):
+            with self.subTest(action=action):
+                with CaptureQueriesContext(connection) as small_batch:
+                    self.batch(action, small)
+                with CaptureQueriesContext(connection) as large_batch:
+                    self.batch(action, large)
+                self.assertEqual(len(large_batch), len(small_batch))
+
+    def test_bad_requests(self):
+        """Некорректное тело и слишком длинный список дают 400."""
+        response = self.reader_client.post(
+            reverse('posts:follow_batch'), 'не json',
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with self.settings(FOLLOW_BATCH_LIMIT=2):
+            response = self.batch('follow', ['a', 'b', 'c'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.reader_client.get(
+                reverse('posts:follow_batch')).status_code,
+            405,
+        )
+        for usernames in ('author_0', {'author_0': 1}, [1, 2], None):
+            with self.subTest(usernames=usernames):
+                response = self.batch('follow', usernames)
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_counters_follow_deleted_rows(self):
+        """Счетчики сдвигаются на удаленные строки, а не на число
+        авторов, которые считались подписками до DELETE.
+        """
+        usernames = [author.username for author in self.authors[:2]]
+        self.batch('follow', usernames[:1])
+        stale = {author.pk for author in self.authors[:2]}
+        with mock.patch('posts.follows.followed_ids', return_value=stale):
+            data = self.batch('unfollow', usernames).json()
+        self.assertEqual(data['changed'], 1)
+        self.assertEqual(data['following_count'], 0)
+        counters = self.counters()
+        rebuild_counters()
+        self.assertEqual(self.counters(), counters)
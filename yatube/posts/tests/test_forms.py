@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from hashlib import sha256
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -73,7 +74,7 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 text='Тестовый текст',
                 group=self.group.pk,
-                image='posts/small.gif'
+                image=f'posts/{sha256(self.small_gif).hexdigest()}.gif'
             ).exists()
         )
 
@@ -0,0 +1,50 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from ..models import Follow, Post, User
+
+
+class IndexesTests(TestCase):
+    def test_follow_pair_is_unique(self):
+        """Нельзя дважды подписаться на одного автора."""
+        user = User.objects.create_user(username='user')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+
+    def test_feed_queries_use_composite_indexes(self):
+        """Запросы страниц лент, как их строят представления,
+        читаются по составным индексам без сортировки в памяти.
+        """
+        out = StringIO()
+        call_command('explain_feeds', seed=300, runs=1, stdout=out)
+        plan = out.getvalue()
+        for index in ('post_pub_date_idx', 'post_author_pub_date_idx',
+                      'post_group_pub_date_idx', 'comment_post_created_idx',
+                      'feeditem_user_pub_date_idx'):
+            with self.subTest(index=index):
+                self.assertIn(index, plan)
+        self.assertIn('следующая страница', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotIn('MULTI-INDEX OR', plan)
+
+    def test_compare_shows_plans_without_indexes(self):
+        """--compare показывает планы без составных индексов и
+        оставляет индексы на месте.
+        """
+        out = StringIO()
+        call_command(
+            'explain_feeds', seed=300, runs=1, compare=True, stdout=out)
+        with_indexes, without_indexes = out.getvalue().split(
+            'Без составных индексов:')
+        self.assertIn('post_pub_date_idx', with_indexes)
+        self.assertNotIn('post_pub_date_idx', without_indexes)
+        self.assertIn('TEMP B-TREE', without_indexes)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        self.assertIn('post_pub_date_idx', constraints)
@@ -0,0 +1,166 @@
+import json
+
+from django.contrib.admin import helpers
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..caching import get_feed_generation
+from ..counters import rebuild_counters
+from ..models import (Comment, Counter, FeedItem, Follow, Group,
+                      ModerationJob, Post, User)
+from ..search import search_posts
+from .utils import run_on_commit
+
+
+@override_settings(MODERATION_CHUNK_SIZE=3, JOBS_IMMEDIATE=True)
+class ModerationJobTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Спам', slug='spam')
+        cls.target = Group.objects.create(title='Карантин', slug='target')
+        Follow.objects.create(user=cls.reader, author=cls.spammer)
+        for i in range(7):
+            post = Post.objects.create(
+                text=f'Купите слона {i}', author=cls.spammer, group=cls.group)
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Отличный слон')
+        cls.post = Post.objects.create(text='Обычный пост', author=cls.author)
+        for _ in range(4):
+            Comment.objects.create(
+                post=cls.post, author=cls.spammer, text='Слон со скидкой')
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def run_action(self, model, action, selected, data=None, query=''):
+        """Подтверждает действие в админке. При JOBS_IMMEDIATE
+        задача выполняется сразу вместе с запросом.
+        """
+        url = reverse(
+            f'admin:posts_{model._meta.model_name}_changelist') + query
+        post_data = {
+            'action': action,
+            helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in selected],
+            **(data or {}),
+        }
+        response = self.admin_client.post(url, {**post_data, 'index': 0})
+        self.assertTemplateUsed(
+            response, 'admin/posts/moderation_confirm.html')
+        generation = get_feed_generation()
+        with run_on_commit():
+            response = self.admin_client.post(
+                url, {**post_data, 'apply': 1})
+        self.assertRedirects(response, url)
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.status, ModerationJob.DONE, job.error)
+        self.assertEqual(job.done, job.total)
+        self.assertGreater(get_feed_generation(), generation)
+        return job
+
+    def assertCountersConsistent(self):
+        """Счетчики после задачи совпадают с пересчитанными."""
+        counters = list(Counter.objects.values_list(
+            'user_id', 'posts_count').order_by('user_id'))
+        groups = list(Group.objects.values_list(
+            'pk', 'posts_count').order_by('pk'))
+        posts = list(Post.objects.values_list(
+            'pk', 'comments_count').order_by('pk'))
+        rebuild_counters()
+        self.assertEqual(counters, list(Counter.objects.values_list(
+            'user_id', 'posts_count').order_by('user_id')))
+        self.assertEqual(groups, list(Group.objects.values_list(
+            'pk', 'posts_count').order_by('pk')))
+        self.assertEqual(posts, list(Post.objects.values_list(
+            'pk', 'comments_count').order_by('pk')))
+
+    def test_delete_author_posts(self):
+        """Все посты автора удаляются вместе с комментариями,
+        записями лент и поисковым индексом.
+        """
+        job = self.run_action(
+            Post, 'delete_author_posts',
+            Post.objects.filter(author=self.spammer)[:1])
+        self.assertEqual(job.total, 7)
+        self.assertContains(
+            self.admin_client.get(reverse(
+                'admin:posts_moderationjob_change', args=(job.pk,))),
+            '7 из 7',
+        )
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(Comment.objects.filter(
+            text='Отличный слон').exists())
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertFalse(search_posts('слона').exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertCountersConsistent()
+
+    def test_move_to_group(self):
+        posts = Post.objects.filter(author=self.spammer)[:4]
+        moved = [post.pk for post in posts]
+        self.run_action(
+            Post, 'move_to_group', posts, {'group': self.target.pk})
+        self.assertEqual(
+            set(self.target.posts.values_list('pk', flat=True)), set(moved))
+        self.assertEqual(
+            set(Post.objects.filter(pk__in=moved).values_list(
+                'version', flat=True)),
+            {2},
+        )
+        self.assertCountersConsistent()
+
+    def test_selected_rows_are_stored_as_ids(self):
+        posts = Post.objects.filter(author=self.spammer)[:2]
+        job = self.run_action(Post, 'delete_posts', posts)
+        self.assertEqual(
+            json.loads(job.params),
+            {'selection': {'ids': [post.pk for post in posts]}},
+        )
+        self.assertEqual(Post.objects.filter(author=self.spammer).count(), 5)
+        self.assertCountersConsistent()
+
+    def test_select_across_uses_changelist_search(self):
+        """«Выбрать все» сохраняет поиск списка, а не запрос,
+        и задача удаляет все найденные строки, а не только
+        отмеченные на странице.
+        """
+        job = self.run_action(
+            Comment, 'delete_comments',
+            Comment.objects.filter(author=self.spammer)[:1],
+            {'select_across': 1},
+            query='?q=spammer',
+        )
+        self.assertEqual(
+            json.loads(job.params),
+            {'selection': {'filters': {}, 'search': 'spammer'}},
+        )
+        self.assertEqual(job.total, 4)
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertEqual(Comment.objects.count(), 7)
+        self.assertCountersConsistent()
+
+    def test_purge_comments_matching_text(self):
+        self.run_action(
+            Comment, 'purge_comments',
+            Comment.objects.filter(text='Слон со скидкой')[:1],
+            {'text': 'со скидкой'},
+        )
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+        self.assertEqual(Comment.objects.count(), 7)
+        self.assertCountersConsistent()
+
+    def test_default_delete_action_is_replaced(self):
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'))
+        actions = dict(response.context['action_form'].fields[
+            'action'].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('delete_posts', actions)
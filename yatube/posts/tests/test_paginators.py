@@ -0,0 +1,109 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginators import CursorPaginator
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.user)
+            for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_pages_cover_all_posts_once(self):
+        """Курсоры проходят все посты по порядку без пропусков и повторов."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.cursor_page()
+        seen = list(page)
+        while page.next_cursor:
+            page = paginator.cursor_page(page.next_cursor)
+            seen.extend(page)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор предыдущей страницы возвращает ту же первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first_page = paginator.cursor_page()
+        second_page = paginator.cursor_page(first_page.next_cursor)
+        self.assertIsNone(first_page.previous_cursor)
+        back = paginator.cursor_page(second_page.previous_cursor)
+        self.assertEqual(list(back), list(first_page))
+        self.assertIsNone(back.previous_cursor)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор не ломает страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.cursor_page('not-a-cursor')
+        self.assertEqual(list(page), list(paginator.cursor_page()))
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Курсор с чужими типами или пустыми значениями
+        отдает первую страницу, а не ошибку сервера.
+        """
+        cursors = (
+            ['n', ['garbage', 1]],
+            ['n', ['2020-01-01T00:00:00', 'x']],
+            ['n', [None, None]],
+            ['n', [['2020-01-01T00:00:00'], {}]],
+            ['n', {'pub_date': 1, 'id': 2}],
+            ['n', [True, 1]],
+        )
+        for url in (reverse('posts:index'), reverse('posts:search')):
+            first_page = list(self.guest_client.get(
+                url, {'q': 'пост'}).context['page_obj'])
+            for data in cursors:
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(data).encode()).decode()
+                with self.subTest(cursor=data, url=url):
+                    cache.clear()
+                    response = self.guest_client.get(
+                        url, {'cursor': cursor, 'q': 'пост'})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        list(response.context['page_obj']), first_page)
+
+    def test_next_page_query_is_sargable(self):
+        """Страница по курсору читает индекс диапазоном: без
+        разбора OR на несколько индексов и полной сортировки.
+        """
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.cursor_page().next_cursor
+        queryset = paginator.cursor_queryset(cursor)[2][:11]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('post_pub_date_idx', plan)
+        self.assertNotIn('MULTI-INDEX OR', plan)
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_cursor_page_skips_count_query(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.cursor_page().next_cursor
+        with self.assertNumQueries(1):
+            paginator.cursor_page(cursor)
+
+    def test_index_renders_cursor_links(self):
+        """Лента выдает ссылку на следующую страницу по курсору."""
+        response = self.guest_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 10)
@@ -0,0 +1,63 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .utils import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Число запросов на страницу не зависит от числа постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        # Кэш перед замером пуст, поэтому страницы группы, автора
+        # и поста делают еще запрос за id для областей поколений.
+        cls.budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}): 5,
+            reverse('posts:profile', kwargs={'username': cls.author}): 6,
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}): 5,
+            reverse('posts:follow_index'): 4,
+        }
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def add_content(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            Post.objects.create(
+                text=f'Пост {i}', author=self.author, group=self.group)
+            Comment.objects.create(
+                post=self.post, author=commenter, text=f'Комментарий {i}')
+
+    def test_query_budgets_do_not_grow_with_posts(self):
+        """Лента и страница поста не делают запросов на каждый пост."""
+        for posts_count in (12, 24):
+            self.add_content(posts_count)
+            for url, budget in self.budgets.items():
+                client = (
+                    self.reader_client
+                    if url == reverse('posts:follow_index')
+                    else self.author_client
+                )
+                with self.subTest(url=url, posts_count=posts_count):
+                    self.assertQueryBudget(client, url, budget)
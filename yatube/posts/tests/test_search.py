@@ -0,0 +1,101 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginators import CursorPaginator
+from ..search import SEARCH_ORDERING, rebuild_index, search_posts
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.cats = Post.objects.create(
+            text='Кошки любят спать на солнце', author=cls.author)
+        cls.dogs = Post.objects.create(
+            text='Собаки любят гулять', author=cls.author)
+
+    def search(self, query):
+        return list(search_posts(query).order_by('rank', '-pk'))
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        self.assertEqual(self.search('кошки'), [self.cats])
+        self.assertEqual(self.search('люб'), [self.dogs, self.cats])
+        post = Post.objects.create(text='Попугаи', author=self.author)
+        self.assertEqual(self.search('попугаи'), [post])
+        post.text = 'Хомяки'
+        post.save()
+        self.assertEqual(self.search('попугаи'), [])
+        self.assertEqual(self.search('хомяки'), [post])
+        post.delete()
+        self.assertEqual(self.search('хомяки'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Спецсимволы FTS5 в запросе не ломают поиск."""
+        for query in ('"кошки', 'кошки OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                list(search_posts(query))
+
+    def test_search_page_is_ranked_and_paginated(self):
+        """Страница поиска отдает посты по рангу, а ссылки
+        пагинации сохраняют запрос.
+        """
+        for i in range(12):
+            Post.objects.create(text=f'Кошки и котята {i}', author=self.author)
+        client = Client()
+        url = reverse('posts:search')
+        response = client.get(url, {'q': 'кошки'})
+        first_page = list(response.context['page_obj'])
+        self.assertEqual(len(first_page), 10)
+        ranks = [post.rank for post in first_page]
+        self.assertEqual(ranks, sorted(ranks))
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(
+            response, f'q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B8&cursor={next_cursor}')
+        response = client.get(url, {'q': 'кошки', 'cursor': next_cursor})
+        second_page = list(response.context['page_obj'])
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_match_runs_once_for_large_result(self):
+        """MATCH выполняется один раз и присоединяет посты по rowid:
+        в плане нет коррелированного подзапроса на каждую строку.
+        """
+        Post.objects.bulk_create(
+            Post(text=f'Кошки {i}', author=self.author) for i in range(300))
+        rebuild_index()
+        paginator = CursorPaginator(
+            search_posts('кошки', Post.objects.select_related('author')),
+            10,
+            ordering=SEARCH_ORDERING,
+        )
+        first_page = paginator.cursor_page()
+        queryset = paginator.cursor_queryset(first_page.next_cursor)[2][:11]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('VIRTUAL TABLE', plan)
+        self.assertIn('INTEGER PRIMARY KEY', plan)
+        self.assertNotIn('CORRELATED', plan)
+        self.assertNotIn('SCAN posts_post ', plan)
+        second_page = paginator.cursor_page(first_page.next_cursor)
+        self.assertEqual(len(second_page), 10)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке не использует LIKE по тексту."""
+        client = Client()
+        client.force_login(self.admin)
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {'q': 'собаки'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.dogs])
+        self.assertFalse(
+            [query for query in context if 'LIKE' in query['sql']])
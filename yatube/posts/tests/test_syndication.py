@@ -0,0 +1,97 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from .utils import run_on_commit
+
+
+@override_settings(SYNDICATION_LIMIT=5)
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(7):
+            Post.objects.create(
+                text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+        cls.other = Post.objects.create(
+            text='Пост без группы', author=User.objects.create_user(
+                username='other'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_json(self, url, **params):
+        response = self.guest_client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_json_feeds_follow_cursor(self):
+        """JSON-ленты отдаются потоком и листаются по ссылке next."""
+        feeds = {
+            reverse('posts:feed', args=['json']): 8,
+            reverse('posts:group_feed', args=[self.group.slug, 'json']): 7,
+            reverse('posts:profile_feed', args=[self.user.username, 'json']):
+                7,
+        }
+        for url, total in feeds.items():
+            with self.subTest(url=url):
+                data = self.get_json(url)
+                self.assertEqual(len(data['items']), 5)
+                self.assertIn('cursor=', data['next'])
+                next_page = self.get_json(data['next'])
+                self.assertEqual(len(next_page['items']), total - 5)
+                self.assertIsNone(next_page['next'])
+                ids = [item['id'] for item in data['items']
+                       + next_page['items']]
+                self.assertEqual(len(set(ids)), total)
+
+    def test_xml_feeds_are_valid(self):
+        """RSS и Atom разбираются как XML и содержат записи."""
+        for feed_format, tag in (
+            ('rss', 'channel/item'),
+            ('atom', '{http://www.w3.org/2005/Atom}entry'),
+        ):
+            with self.subTest(feed_format=feed_format):
+                response = self.guest_client.get(
+                    reverse('posts:group_feed',
+                            args=[self.group.slug, feed_format]))
+                self.assertIn(feed_format, response['Content-Type'])
+                root = ElementTree.fromstring(
+                    b''.join(response.streaming_content))
+                self.assertEqual(len(root.findall(tag)), 5)
+
+    def test_feed_is_cached_and_conditional(self):
+        """Повторная лента берется из кэша и отвечает 304 по ETag,
+        а новый пост сбрасывает и то, и другое.
+        """
+        url = reverse('posts:feed', args=['json'])
+        response = self.guest_client.get(url)
+        body = b''.join(response.streaming_content)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(url)
+        self.assertEqual(cached.content, body)
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            304,
+        )
+        with run_on_commit():
+            Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertEqual(
+            self.get_json(url)['items'][0]['text'], 'Свежий пост')
+
+    def test_unknown_format_is_not_found(self):
+        """Неизвестный формат ленты дает 404."""
+        response = self.guest_client.get('/feed/xml/')
+        self.assertEqual(response.status_code, 404)
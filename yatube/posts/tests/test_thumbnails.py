@@ -0,0 +1,98 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Job
+
+from ..models import Post, User
+from ..thumbnails import generate_thumbnails, get_thumbnail
+from .utils import run_on_commit
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(color):
+    image = BytesIO()
+    Image.new('RGB', (1200, 800), color=color).save(image, 'JPEG')
+    return SimpleUploadedFile(
+        'big.jpg', image.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_IMMEDIATE=False)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            image=make_image((255, 0, 0)),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_placeholder_while_thumbnail_is_pending(self):
+        """Пока миниатюры не нарезаны, страница показывает заглушку
+        и не режет картинку в запросе.
+        """
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Изображение обрабатывается')
+        self.assertIsNone(get_thumbnail(self.post.image, 'feed'))
+
+    def test_pregenerated_thumbnails_are_rendered(self):
+        """После нарезки страница, закэшированная с заглушкой,
+        отдает готовые миниатюры всех размеров.
+        """
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.assertContains(
+            self.guest_client.get(url), 'Изображение обрабатывается')
+        with run_on_commit():
+            generate_thumbnails(self.post.image.name)
+        version = self.post.version
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.version, version)
+        for size, (geometry, options) in settings.THUMBNAIL_SIZES.items():
+            with self.subTest(size=size):
+                thumbnail = get_thumbnail(self.post.image, size)
+                self.assertIsNotNone(thumbnail)
+                self.assertEqual(
+                    f'{thumbnail.width}x{thumbnail.height}', geometry)
+        response = self.guest_client.get(url)
+        feed = get_thumbnail(self.post.image, 'feed')
+        self.assertContains(response, feed.url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_any_saved_image_is_queued(self):
+        """Нарезка ставится в очередь при сохранении поста с новой
+        картинкой откуда угодно, а не только из форм сайта.
+        """
+        def queued():
+            return list(Job.objects.filter(
+                name=generate_thumbnails.task_name,
+            ).order_by('pk').values_list('payload', flat=True))
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(len(queued()), 1)
+        self.assertIn(post.image.name, queued()[0])
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(len(queued()), 1)
+        post.image = make_image((0, 0, 255))
+        post.save()
+        self.assertEqual(len(queued()), 2)
+        self.assertIn(post.image.name, queued()[1])
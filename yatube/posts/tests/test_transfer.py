@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Job
+
+from ..models import Comment, Counter, FeedItem, Follow, Group, Post, User
+from ..search import search_posts, unindex_post
+from ..thumbnails import generate_thumbnails
+
+
+class TransferCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, kind, file_format):
+        path = os.path.join(self.directory, f'{kind}.{file_format}')
+        call_command('export_posts', kind, path, format=file_format,
+                     stderr=StringIO())
+        return path
+
+    def import_(self, kind, path, file_format):
+        out = StringIO()
+        call_command('import_posts', kind, path, format=file_format,
+                     batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip_keeps_data(self):
+        """Выгрузка и загрузка сохраняют посты, даты, комментарии,
+        подписки и производные счетчики.
+        """
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format=file_format):
+                paths = {kind: self.export(kind, file_format)
+                         for kind in ('posts', 'comments', 'follows')}
+                pub_date = Post.objects.get().pub_date
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for kind in ('posts', 'comments', 'follows'):
+                    output = self.import_(kind, paths[kind], file_format)
+                    self.assertIn('строк/с', output)
+                post = Post.objects.get()
+                self.assertEqual(post.pk, self.post.pk)
+                self.assertEqual(post.pub_date, pub_date)
+                self.assertEqual(post.group, self.group)
+                self.assertEqual(post.comments_count, 1)
+                self.assertTrue(Follow.objects.filter(
+                    user=self.reader, author=self.author).exists())
+                self.assertEqual(
+                    Counter.objects.get(user=self.author).posts_count, 1)
+                self.assertTrue(FeedItem.objects.filter(
+                    user=self.reader, post=post).exists())
+
+    def test_unknown_authors_are_skipped(self):
+        """Строки с неизвестным автором пропускаются."""
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Пост", "pub_date": "2022-03-26T12:15:00+00:00",'
+                ' "author": "nobody", "group": null}\n')
+        output = self.import_('posts', path, 'jsonl')
+        self.assertIn('Загружено 0, пропущено 1', output)
+
+    def test_comment_without_post_is_skipped(self):
+        """Строка комментария с пустым или битым постом пропускается."""
+        path = os.path.join(self.directory, 'comments.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.write(
+                'id,post,author,text,created\n'
+                ',,reader,Без поста,2022-03-26T12:15:00+00:00\n'
+                ',abc,reader,Битый пост,2022-03-26T12:15:00+00:00\n'
+                f',{self.post.pk},reader,Новый,2022-03-26T12:15:00+00:00\n'
+            )
+        output = self.import_('comments', path, 'csv')
+        self.assertIn('Загружено 1, пропущено 2', output)
+        self.assertEqual(Post.objects.get().comments_count, 2)
+
+    def test_existing_rows_are_not_counted(self):
+        """Уже загруженные строки не считаются загруженными, а
+        счетчики пересчитываются только у затронутых авторов.
+        """
+        bystander = User.objects.create_user(username='bystander')
+        Counter.objects.filter(user=bystander).update(posts_count=7)
+        path = self.export('posts', 'jsonl')
+        with open(path, 'a', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Пост", "pub_date": "2022-03-26T12:15:00+00:00",'
+                ' "author": "author", "group": "test-slug"}\n')
+        output = self.import_('posts', path, 'jsonl')
+        self.assertIn('Загружено 1, пропущено 1', output)
+        self.assertEqual(
+            Counter.objects.get(user=self.author).posts_count, 2)
+        self.assertEqual(Group.objects.get().posts_count, 2)
+        self.assertEqual(Counter.objects.get(user=bystander).posts_count, 7)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(JOBS_IMMEDIATE=False)
+    def test_imported_images_are_queued(self):
+        """bulk_create обходит сигналы, поэтому нарезку миниатюр
+        для загруженных картинок ставит сам импорт.
+        """
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Пост", "pub_date": "2022-03-26T12:15:00+00:00",'
+                ' "author": "author", "image": "posts/imported.jpg"}\n')
+        self.import_('posts', path, 'jsonl')
+        job = Job.objects.get(name=generate_thumbnails.task_name)
+        self.assertIn('posts/imported.jpg', job.payload)
+
+    def test_import_indexes_only_imported_posts(self):
+        """Загруженные посты попадают в поиск, а индекс остальных
+        постов не перестраивается.
+        """
+        unindex_post(self.post.pk)
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for i in range(3):
+                stream.write(
+                    f'{{"text": "Загруженный пост {i}", '
+                    '"pub_date": "2022-03-26T12:15:00+00:00", '
+                    '"author": "author"}\n')
+        self.import_('posts', path, 'jsonl')
+        self.assertEqual(search_posts('загруженный').count(), 3)
+        self.assertFalse(search_posts('тестовый').exists())
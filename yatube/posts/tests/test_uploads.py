@@ -0,0 +1,191 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.jobs import work
+from core.models import Job
+
+from ..models import Post, StoredImage, User
+from ..thumbnails import delete_image
+from ..uploads import prepare_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(size, mode='RGB', image_format='JPEG', name='image.jpg'):
+    content = BytesIO()
+    Image.new(mode, size).save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def make_noise_image(size, name='noise.png'):
+    """PNG из случайных точек: почти не сжимается."""
+    content = BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(
+        content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PrepareImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_small_image_is_kept(self):
+        """Небольшая картинка сохраняется без перекодирования."""
+        upload = make_image((100, 100), image_format='PNG', name='a.png')
+        self.assertIs(prepare_image(upload), upload)
+
+    @override_settings(IMAGE_MAX_SIDE=200)
+    def test_large_image_is_downscaled(self):
+        """Большая картинка уменьшается до IMAGE_MAX_SIDE и
+        перекодируется: JPEG без прозрачности, PNG с ней.
+        """
+        cases = (
+            ('RGB', 'big.bmp', 'BMP', 'big.jpg', 'JPEG'),
+            ('RGBA', 'big.png', 'PNG', 'big.png', 'PNG'),
+        )
+        for mode, name, image_format, expected_name, expected_format in cases:
+            with self.subTest(mode=mode):
+                upload = prepare_image(
+                    make_image((800, 400), mode, image_format, name))
+                self.assertEqual(upload.name, expected_name)
+                with Image.open(upload) as image:
+                    self.assertEqual(image.size, (200, 100))
+                    self.assertEqual(image.format, expected_format)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_upload_size_limit(self):
+        """Слишком большой файл отклоняется формой с понятной
+        ошибкой, пост не создается.
+        """
+        client = Client()
+        client.force_login(User.objects.create_user(username='auth'))
+        upload = SimpleUploadedFile(
+            'big.gif', os.urandom(4096), content_type='image/gif')
+        response = client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый пост', 'image': upload},
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка не должна быть больше 1,0\xa0КБ')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_admin_upload_is_not_limited(self):
+        """Ограничение размера действует только в формах постов:
+        админка получает файл целиком.
+        """
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(admin)
+        client.get(reverse('admin:posts_post_add'))
+        upload = make_noise_image((40, 40))
+        self.assertGreater(upload.size, 1024)
+        response = client.post(
+            reverse('admin:posts_post_add'),
+            data={
+                'text': 'Пост из админки',
+                'author': admin.pk,
+                'image': upload,
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get()
+        self.assertEqual(post.image.size, upload.size)
+
+    def test_post_form_checks_csrf(self):
+        """Формы постов по-прежнему проверяют CSRF, хотя
+        обработчик загрузки подключается до проверки.
+        """
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_user(username='auth'))
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Тестовый пост'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_IMMEDIATE=False)
+class ContentAddressedStorageTests(TestCase):
+    """Файлы удаляет отложенная задача delete_image: тесты
+    сдвигают время последнего сохранения и запускают очередь.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+
+    def create_post(self, upload):
+        return Post.objects.create(
+            text='Тестовый пост', author=self.user, image=upload)
+
+    def run_deletions(self):
+        """Выполняет задачи удаления так, будто IMAGE_DELETE_DELAY
+        уже прошла.
+        """
+        past = timezone.now() - timedelta(
+            seconds=settings.IMAGE_DELETE_DELAY + 1)
+        StoredImage.objects.update(saved=past)
+        Job.objects.filter(name=delete_image.task_name).update(run_at=past)
+        work('test', threading.Event(), 0, once=True)
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки ссылаются на один файл, который
+        удаляется после последнего поста.
+        """
+        first = self.create_post(make_image((10, 10), name='first.jpg'))
+        second = self.create_post(make_image((10, 10), name='second.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        path = first.image.path
+        first.delete()
+        self.run_deletions()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertTrue(os.path.exists(path))
+        self.run_deletions()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_is_released(self):
+        """Замененная картинка удаляется, если больше не нужна."""
+        post = self.create_post(make_image((10, 10)))
+        path = post.image.path
+        post.image = make_image((20, 20))
+        post.save()
+        self.run_deletions()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_recent_save_keeps_file(self):
+        """Файл, который недавно сохранили для еще не закоммиченного
+        поста, не удаляется вместе с последним закоммиченным постом.
+        """
+        post = self.create_post(make_image((30, 30)))
+        storage = Post._meta.get_field('image').storage
+        name = storage.save(
+            'posts/pending.jpg', make_image((30, 30), name='pending.jpg'))
+        self.assertEqual(name, post.image.name)
+        post.delete()
+        delete_image(name)
+        self.assertTrue(storage.exists(name))
+        self.run_deletions()
+        self.assertFalse(storage.exists(name))
@@ -5,6 +5,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 
 from ..models import Group, Post, User
+from .utils import run_on_commit
 
 
 class PostsURLTests(TestCase):
@@ -114,22 +115,28 @@ class PostsURLTests(TestCase):
             response, (reverse('users:login') + '?next=/posts/1/comment/'))
 
     def test_cashe(self):
-        """Проверяем работу кэша."""
+        """Проверяем работу кэша: страница берется из кэша, пока
+        посты не меняются, и обновляется сразу после изменения.
+        """
         post = Post.objects.create(
             author=self.post. author, text='Тестовый пост',)
         first_response = self.authorized_client_author.get(
             reverse('posts:index'))
         post_exits = first_response.content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         second_response = self.authorized_client_author.get(
             reverse('posts:index'))
-        post_delete = second_response.content
-        self.assertEqual(post_exits, post_delete)
-        cache.clear()
+        self.assertEqual(post_exits, second_response.content)
+        with run_on_commit():
+            post.delete()
         third_response = self.authorized_client_author.get(
             reverse('posts:index'))
-        cache_cleared = third_response.content
-        self.assertNotEqual(post_exits, cache_cleared)
+        post_delete = third_response.content
+        self.assertNotEqual(post_exits, post_delete)
+        cache.clear()
+        fourth_response = self.authorized_client_author.get(
+            reverse('posts:index'))
+        self.assertEqual(post_delete, fourth_response.content)
 
     def test_page_404_uses_correct_template(self):
         """Cтраница 404 отдает кастомный шаблон."""
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def run_on_commit():
+    """Выполняет колбэки transaction.on_commit, добавленные в блоке,
+    как после коммита: TestCase свою транзакцию не коммитит. Аналог
+    captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        _, callback = connection.run_on_commit.pop(start)
+        callback()
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в заданное число SQL-запросов."""
+
+    def assertQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries)
+        self.assertEqual(
+            len(context), budget,
+            f'{url}: выполнено {len(context)} запросов '
+            f'при бюджете {budget}:\n{queries}'
+        )
+        return response
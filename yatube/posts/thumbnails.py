@@ -0,0 +1,103 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.jobs import enqueue, task
+
+from .caching import bump_feed_generation, post_scopes
+from .models import Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+
+class LookupThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl, который только ищет готовую миниатюру
+    в key-value хранилище и никогда не режет картинку сам.
+    """
+
+    def lookup(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+lookup_backend = LookupThumbnailBackend()
+
+
+def get_thumbnail(image, size):
+    """Готовая миниатюра размера из THUMBNAIL_SIZES или None."""
+    if not image:
+        return None
+    geometry, options = settings.THUMBNAIL_SIZES[size]
+    return lookup_backend.lookup(image, geometry, **options)
+
+
+@task
+def generate_thumbnails(name):
+    # Ключ sorl зависит от хранилища, поэтому оригинал открывается
+    # через хранилище поля, как в get_thumbnail.
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    for geometry, options in settings.THUMBNAIL_SIZES.values():
+        default.backend.get_thumbnail(source, geometry, **options)
+    # Карточки и страницы с заглушкой вместо картинки
+    # больше не актуальны.
+    posts = Post.objects.filter(image=name)
+    posts.update(version=F('version') + 1)
+    bump_feed_generation(*{
+        scope
+        for post in posts.values_list('pk', 'author_id', 'group_id')
+        for scope in post_scopes(*post)
+    })
+
+
+def schedule_thumbnails(post):
+    """Ставит нарезку миниатюр в очередь core.jobs вместе
+    с сохранением поста.
+    """
+    if post.image:
+        generate_thumbnails.delay(post.image.name)
+
+
+def release_image(name):
+    """Ставит удаление оригинала и его миниатюр через
+    IMAGE_DELETE_DELAY секунд: к этому времени закоммичены посты,
+    которые сохраняли тот же файл, пока его отпускал этот.
+    """
+    if name:
+        enqueue(delete_image, [name], delay=settings.IMAGE_DELETE_DELAY)
+
+
+@task
+def delete_image(name):
+    """Удаляет файл, если на него не ссылается ни один пост и его
+    не сохраняли последние IMAGE_DELETE_DELAY секунд. Запись в строку
+    StoredImage ждет незакоммиченного сохранения того же файла
+    (posts.uploads.lock_image), а новое сохранение ждет конца удаления.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IMAGE_DELETE_DELAY)
+    StoredImage.objects.filter(name=name, saved__lt=cutoff).delete()
+    if (
+        StoredImage.objects.filter(name=name).exists()
+        or Post.objects.filter(image=name).exists()
+    ):
+        return
+    storage = Post._meta.get_field('image').storage
+    try:
+        default.backend.delete(ImageFile(name, storage))
+    except Exception:
+        logger.exception('Не удалось удалить картинку %s', name)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+from functools import wraps
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше
+    IMAGE_UPLOAD_MAX_SIZE байт: остаток запроса читается и
+    отбрасывается, а файл помечается too_large для формы.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            if not self.too_large:
+                self.too_large = True
+                self.file.truncate(0)
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.too_large = self.too_large
+        return file
+
+
+def limited_uploads(view):
+    """Включает LimitedUploadHandler только для обернутого view,
+    остальные формы (например, админка) получают файл целиком.
+    Обработчики нельзя сменить после чтения request.POST, а его
+    читает CsrfViewMiddleware, поэтому CSRF проверяется внутри.
+    """
+    protected_view = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [LimitedUploadHandler(request)]
+        return protected_view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def prepare_image(upload):
+    """Оригиналы больше IMAGE_MAX_SIDE точек или IMAGE_REENCODE_SIZE
+    байт уменьшаются и перекодируются в JPEG (PNG, если есть
+    прозрачность), остальные сохраняются как есть.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if (
+            max(image.size) <= settings.IMAGE_MAX_SIDE
+            and upload.size <= settings.IMAGE_REENCODE_SIZE
+        ):
+            upload.seek(0)
+            return upload
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE))
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image_format, extension = 'PNG', '.png'
+        else:
+            image_format, extension = 'JPEG', '.jpg'
+            image = image.convert('RGB')
+        content = BytesIO()
+        image.save(content, image_format, quality=85, optimize=True)
+    name = os.path.splitext(upload.name)[0] + extension
+    return SimpleUploadedFile(
+        name, content.getvalue(), content_type=Image.MIME[image_format])
+
+
+def lock_image(name):
+    """Пишет время сохранения в строку StoredImage файла: UPDATE
+    держит блокировку строки (в SQLite — всей базы) до конца
+    транзакции, поэтому удаление файла (posts.thumbnails.delete_image)
+    ждет коммита поста, который на него сошлется.
+    """
+    # Модель импортируется лениво: posts.models импортирует этот модуль.
+    stored_images = apps.get_model('posts', 'StoredImage').objects
+    now = timezone.now()
+    if stored_images.filter(name=name).update(saved=now):
+        return
+    _, created = stored_images.get_or_create(
+        name=name, defaults={'saved': now})
+    if not created:
+        stored_images.filter(name=name).update(saved=now)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файл называется sha256 своего содержимого, поэтому одинаковые
+    картинки от разных постов хранятся на диске одним файлом.
+    Файл удаляет отложенная задача, когда на него больше не ссылается
+    ни один пост (см. posts.thumbnails.release_image).
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = '/'.join(
+            filter(None, (directory, digest.hexdigest() + extension)))
+        with transaction.atomic():
+            lock_image(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
@@ -0,0 +1,24 @@
+from django.conf import settings
+
+from .paginators import CursorPaginator
+
+
+def get_page_obj(request, posts, **kwargs):
+    """Страница ленты по ?cursor=, а для старых ссылок — по ?page=."""
+    paginator = CursorPaginator(posts, settings.LIMIT_POSTS, **kwargs)
+    page_number = request.GET.get('page')
+    if page_number and not request.GET.get('cursor'):
+        page_obj = paginator.get_page(page_number)
+        return paginator.attach_cursors(
+            page_obj, page_obj.has_next(), page_obj.has_previous())
+    return paginator.cursor_page(request.GET.get('cursor'))
+
+
+def post_comments(post):
+    return post.comments.select_related('author').order_by('created', 'pk')
+
+
+def get_comments_page(request, post):
+    """Порция комментариев от старых к новым после ?cursor=."""
+    paginator = CursorPaginator(post_comments(post), settings.LIMIT_COMMENTS)
+    return paginator.cursor_page(request.GET.get('cursor'))
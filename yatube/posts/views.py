@@ -1,75 +1,172 @@
+import json
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from core.db import read_replica
 
+from .caching import anonymous_page, conditional_feed, feed_cache_context
+from .counters import get_user_counter
+from .feeds import followed_posts
+from .follows import follow_authors, lock_follower, unfollow_authors
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Counter, Follow, Group, Post
+from .search import SEARCH_ORDERING, search_posts
+from .syndication import feed_response
+from .uploads import limited_uploads
+from .utils import get_comments_page, get_page_obj
 
 
+@anonymous_page
+@conditional_feed
+@read_replica
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    paginator = Paginator(posts, settings.LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = get_page_obj(request, posts, approximate_count=True)
     context = {
         'posts': posts,
         'page_obj': page_obj,
+        **feed_cache_context(request),
     }
     return render(request, template, context)
 
 
+@anonymous_page
+@conditional_feed
+@read_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, posts)
     context = {
         'posts': posts,
         'group': group,
         'page_obj': page_obj,
+        **feed_cache_context(request),
     }
     return render(request, template, context)
 
 
+@anonymous_page
+@conditional_feed
+@read_replica
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, settings.LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_count = author.posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('counter'), username=username)
+    posts = author.posts.select_related('group')
+    page_obj = get_page_obj(request, posts)
+    counter = get_user_counter(author)
     following = (request.user.is_authenticated
                  and author.following.filter(user=request.user).exists())
     context = {
         'posts': posts,
         'page_obj': page_obj,
         'author': author,
-        'post_count': post_count,
+        'post_count': counter.posts_count,
+        'counter': counter,
         'following': following,
+        **feed_cache_context(request),
     }
     return render(request, template, context)
 
 
+@conditional_feed
+def feed(request, feed_format):
+    posts = Post.objects.select_related('author', 'group')
+    return feed_response(
+        request, posts, feed_format,
+        title='Последние обновления на сайте',
+        link=reverse('posts:index'),
+    )
+
+
+@conditional_feed
+def group_feed(request, slug, feed_format):
+    group = get_object_or_404(Group, slug=slug)
+    posts = group.posts.select_related('author', 'group')
+    return feed_response(
+        request, posts, feed_format,
+        title=group.title,
+        link=reverse('posts:group_list', kwargs={'slug': slug}),
+        description=group.description,
+    )
+
+
+@conditional_feed
+def profile_feed(request, username, feed_format):
+    author = get_object_or_404(User, username=username)
+    posts = author.posts.select_related('author', 'group')
+    return feed_response(
+        request, posts, feed_format,
+        title=f'Записи пользователя {author.get_full_name() or username}',
+        link=reverse('posts:profile', kwargs={'username': username}),
+    )
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query, Post.objects.select_related('author', 'group'))
+    page_obj = get_page_obj(request, posts, ordering=SEARCH_ORDERING)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@anonymous_page
+@conditional_feed
+@read_replica
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counter', 'group'),
+        id=post_id
+    )
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
+        'author_counter': get_user_counter(post.author),
         'form': form,
-        'comments': comments,
+    }
+    # Шаблон показывает комментарии только автору поста.
+    if request.user == post.author:
+        context['comments'] = get_comments_page(request, post)
+    return render(request, template, context)
+
+
+@conditional_feed
+@read_replica
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать еще»,
+    как и на странице поста, — только автору.
+    """
+    template = 'posts/includes/comment_list.html'
+    post = get_object_or_404(
+        Post.objects.only('pk', 'author_id'), id=post_id)
+    if post.author_id != request.user.pk:
+        raise PermissionDenied
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post),
     }
     return render(request, template, context)
 
 
 @login_required
+@limited_uploads
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -81,6 +178,8 @@ def post_create(request):
     return render(request, template, {'form': form})
 
 
+@limited_uploads
+@transaction.atomic
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, id=post_id)
@@ -103,6 +202,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -115,12 +215,11 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = followed_posts(request.user).select_related('author', 'group')
+    page_obj = get_page_obj(request, posts, tiebreaker='feed_post')
     context = {
         'page_obj': page_obj,
     }
@@ -128,17 +227,62 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
+        lock_follower(request.user)
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(user=request.user, author=author)
-    if follow.exists():
-        follow.delete()
+    lock_follower(request.user)
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+FOLLOW_ACTIONS = {
+    'follow': follow_authors,
+    'unfollow': unfollow_authors,
+}
+
+
+@login_required
+@require_POST
+def follow_batch(request):
+    """Подписка или отписка сразу на список авторов:
+    {"action": "follow" | "unfollow", "usernames": [...]}.
+    Повторный запрос ничего не меняет.
+    """
+    try:
+        data = json.loads(request.body)
+        action = FOLLOW_ACTIONS[data['action']]
+        usernames = data['usernames']
+        if not isinstance(usernames, list) or not all(
+                isinstance(name, str) for name in usernames):
+            raise TypeError('usernames')
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {'error': 'Ожидается {"action": ..., "usernames": [...]}'},
+            status=400,
+        )
+    if len(usernames) > settings.FOLLOW_BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.FOLLOW_BATCH_LIMIT} авторов'},
+            status=400,
+        )
+    authors, changed = action(request.user, usernames)
+    found = set(authors.values())
+    return JsonResponse({
+        'following': sorted(found) if data['action'] == 'follow' else [],
+        'not_found': sorted(
+            set(usernames) - found - {request.user.username}),
+        'changed': changed,
+        'following_count': Counter.objects.filter(
+            user=request.user).values_list(
+                'following_count', flat=True).first(),
+    })
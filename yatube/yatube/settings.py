@@ -28,25 +28,45 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.PinPrimaryMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Профиль шаблонов: cached — каждый шаблон разбирается один раз
+# на процесс, кэш прогревается при старте (core.templating),
+# default — шаблоны перечитываются с диска при каждом рендеринге.
+TEMPLATE_PROFILE = os.getenv(
+    'YATUBE_TEMPLATE_PROFILE', 'default' if DEBUG else 'cached')
+
+TEMPLATE_PROFILES = {
+    'default': [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ],
+}
+
+TEMPLATE_PROFILES['cached'] = [
+    ('django.template.loaders.cached.Loader', TEMPLATE_PROFILES['default']),
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_PROFILES[TEMPLATE_PROFILE],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -60,13 +80,56 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Профиль SQLite: tuned — WAL, прагмы и BEGIN IMMEDIATE
+# (core.backends.sqlite3), default — стандартный бэкенд Django.
+SQLITE_PROFILE = os.getenv('YATUBE_SQLITE_PROFILE', 'tuned')
+
+SQLITE_ENGINES = {
+    'tuned': 'core.backends.sqlite3',
+    'default': 'django.db.backends.sqlite3',
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': SQLITE_ENGINES[SQLITE_PROFILE],
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 600)),
     }
 }
 
+# Файлы реплик через запятую, например копия db.sqlite3 для проверки.
+DATABASE_REPLICAS = []
+
+for index, replica_name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(','))
+):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'NAME': replica_name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+REPLICA_APP_LABELS = ('posts',)
+
+# Сколько секунд реплики могут отставать от основной базы: столько
+# после любой записи в ленты страницы с реплик не кэшируются, а браузер
+# автора после POST закрепляется за default.
+REPLICA_MAX_LAG = 10
+
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,6 +165,55 @@ LIMIT_POSTS = 10
 
 LIMIT_SYMBOL = 15
 
+LIMIT_COMMENTS = 50
+
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+FOLLOW_FEED_SIZE = 1000
+
+FOLLOW_FANOUT_LIMIT = 5000
+
+FOLLOW_BATCH_LIMIT = 100
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+SYNDICATION_LIMIT = 50
+
+SYNDICATION_MAX_LIMIT = 1000
+
+THUMBNAIL_SIZES = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+    'mobile': ('480x170', {'crop': 'center', 'upscale': True}),
+}
+
+MODERATION_CHUNK_SIZE = 500
+
+# Очередь фоновых задач core.jobs, воркеры — manage.py run_workers.
+# При JOBS_IMMEDIATE задачи выполняются сразу в потоке, который
+# их поставил: так удобно разрабатывать без запущенных воркеров.
+# Включается только явно, DEBUG здесь всегда True.
+JOBS_IMMEDIATE = os.getenv('YATUBE_JOBS_IMMEDIATE', '0') == '1'
+
+JOB_WORKER_PROCESSES = int(os.getenv('YATUBE_JOB_PROCESSES', 1))
+
+JOB_WORKER_THREADS = int(os.getenv('YATUBE_JOB_THREADS', 4))
+
+JOB_POLL_INTERVAL = 1
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_RETRY_BASE_DELAY = 10
+
+JOB_RETRY_MAX_DELAY = 60 * 60
+
+JOB_LOCK_TIMEOUT = 60 * 10
+
+JOB_RETENTION = 60 * 60 * 24 * 7
+
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
@@ -114,8 +226,64 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+
+IMAGE_REENCODE_SIZE = 2 * 1024 * 1024
+
+IMAGE_MAX_SIDE = 2560
+
+# Через сколько секунд после отвязки от поста удаляется файл картинки,
+# если на него больше никто не ссылается.
+IMAGE_DELETE_DELAY = 60 * 10
+
+# Кэш хранит только то, что можно потерять или перезаписать: страницы,
+# фрагменты и поколения лент. Блокировки и счетчики живут в базе,
+# потому что add/incr файлового и db-бэкендов не атомарны. Для
+# нескольких серверов берите redis: атомарные операции и пул соединений.
+CACHE_BACKEND = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', '/var/tmp/yatube_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'CONNECTION_POOL_KWARGS': {'max_connections': 50},
+        },
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.getenv('YATUBE_CACHE_VERSION', 1)),
     }
 }
+
+PROFILING_ENABLED = os.getenv('YATUBE_PROFILING') == '1'
+
+PROFILING_SAMPLE_RATE = float(os.getenv('YATUBE_PROFILING_SAMPLE_RATE', 0))
+
+# Путь снимка статистики, {pid} — номер процесса воркера.
+PROFILING_DUMP_PATH = os.getenv('YATUBE_PROFILING_DUMP')
+
+PROFILING_DUMP_INTERVAL = 60
+
+CACHE_NAMESPACE_VERSIONS = {
+    'core': 1,
+    'posts': 1,
+}